@@ -0,0 +1,251 @@
+# Reslot pipeline benchmarks
+#
+# Usage:
+#   Default sweep (1, 2, 4 and 8 slots), results in benchmarks/results/:
+#     python benchmarks/bench_reslot.py
+#   Bigger mods, more repeats, results to a given file:
+#     python benchmarks/bench_reslot.py --slots 8 --files 200 --repeat 10 --out results.json
+#   Rebuild the golden config.json files with the reslotter of the baseline revision:
+#     python benchmarks/bench_reslot.py --update-golden
+#   ... or with another reslotter.py:
+#     python benchmarks/bench_reslot.py --update-golden --baseline path/to/reslotter.py
+#
+# Runs offline against the fixture game index in benchmarks/fixtures/game (see synth.py) and the
+# ui_chara_db files next to reslotter.py. Each case generates a synthetic mod, maps its slots to added
+# slots (c00 -> c08, c01 -> c09, ...) and times the steps of a reslot run. The config.json a case
+# produces is checked, key and list order included, against benchmarks/golden/<case>.config.json when
+# that file exists. Golden files come from the reslotter as it was before the optimization work
+# (BASELINE_REVISION), run on the same mod; the mod's file list is sorted for both so the order
+# doesn't depend on the file system.
+# Exit code: 0 ok, 1 a config differs from its golden file, 2 bad arguments.
+import os
+import sys
+import io
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import contextlib
+import subprocess
+import importlib.util
+
+import synth
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESLOT_DIR = os.path.join(REPO_DIR, "src", "resources", "reslot")
+# reslotter.py imports its sibling modules (cache, events, place, ...) from its own folder
+sys.path.insert(0, RESLOT_DIR)
+FIXTURE_DIR = os.path.join(BENCH_DIR, "fixtures", "game")
+GOLDEN_DIR = os.path.join(BENCH_DIR, "golden")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# last revision before the reslot pipeline optimizations
+BASELINE_REVISION = "f8824bcd447852ac9bca967deaa5a9a1fc91c934"
+DEFAULT_FIGHTERS = "mario,popo,nana"
+DEFAULT_SLOTS = "1,2,4,8"
+STEPS = ("find_fighter_files", "SetFighters", "core_init", "core_run", "CreatePRCXML", "RenameUI")
+
+def load_reslotter(path=None, name="reslotter"):
+    spec = importlib.util.spec_from_file_location(name, path or os.path.join(RESLOT_DIR, "reslotter.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def load_baseline(path, workdir):
+    # the reslotter the golden files are built with: a given file or the one of BASELINE_REVISION
+    if not path:
+        path = os.path.join(workdir, "baseline_reslotter.py")
+        source = subprocess.run(["git", "show", f"{BASELINE_REVISION}:src/resources/reslot/reslotter.py"],
+                                cwd=REPO_DIR, capture_output=True, timeout=60)
+        if source.returncode != 0:
+            raise RuntimeError(f"git show {BASELINE_REVISION} failed: {source.stderr.decode(errors='replace').strip()}")
+        with open(path, "wb") as f:
+            f.write(source.stdout)
+    return load_reslotter(path, "baseline_reslotter")
+
+def case_name(fighters, slots, files):
+    return f"{'-'.join(fighters)}_s{slots}_f{files}"
+
+def prepare_workdir(workdir):
+    # the program directory of a run: game index and ui_chara_db files, as in the app's resources
+    for name in ("dir_info_with_files_trimmed.json", "Hashes_all.txt"):
+        shutil.copy(os.path.join(FIXTURE_DIR, name), workdir)
+    for name in ("ui_chara_db.prcxml", "ui_chara_db.txt"):
+        shutil.copy(os.path.join(RESLOT_DIR, name), workdir)
+
+class Timer:
+    # samples in ms per step
+    def __init__(self):
+        self.samples = {step: [] for step in STEPS}
+
+    @contextlib.contextmanager
+    def step(self, name):
+        started = time.perf_counter()
+        yield
+        self.samples[name].append((time.perf_counter() - started) * 1000)
+
+    def summary(self):
+        out = {}
+        for step, samples in self.samples.items():
+            if samples:
+                out[step] = {"cold": round(samples[0], 3), "min": round(min(samples), 3),
+                             "median": round(statistics.median(samples), 3), "max": round(max(samples), 3)}
+        return out
+
+def reslot_all(rs, mod_dir, target_dir, hashes, fighters, slots):
+    for fighter in fighters:
+        for source_num in range(slots):
+            source, target = f"c0{source_num}", f"c{source_num + 8:02d}"
+            share = f"c0{rs.GetAssumedShareSlot(source_num, fighter)}"
+            rs.core_run(mod_dir, hashes, fighter, source, target, share, target_dir)
+    return json.dumps(rs.ordered_config_dict(rs.resulting_config), ensure_ascii=False, indent=4) + "\n"
+
+def baseline_config(base, mod_dir, target_dir, hashes, fighters, slots, files):
+    # -> the config.json text the baseline reslotter writes for the same run
+    base.find_fighter_files = lambda mod_directory: list(files)
+    with contextlib.redirect_stdout(io.StringIO()):
+        base.core_init(hashes, mod_dir, True)
+        config = reslot_all(base, mod_dir, target_dir, hashes, fighters, slots)
+    shutil.rmtree(target_dir, ignore_errors=True)
+    return config
+
+def run_once(rs, timer, mod_dir, target_dir, hashes, fighters, slots):
+    # One reslot run of every fighter of the mod into target_dir; returns the config.json text
+    rs.reset_mod_indexes()
+    with timer.step("find_fighter_files"):
+        files = sorted(rs.find_fighter_files(mod_dir))
+    rs.reset_mod_indexes()
+    with timer.step("SetFighters"):
+        rs.SetFighters(mod_dir)
+    with timer.step("core_init"):
+        rs.core_init(hashes, mod_dir, True, files)
+    with timer.step("core_run"):
+        config = reslot_all(rs, mod_dir, target_dir, hashes, fighters, slots)
+    rs.pending_copies.clear()
+
+    # the ui files as a reslot leaves them, renamed in place
+    shutil.rmtree(target_dir, ignore_errors=True)
+    shutil.copytree(os.path.join(mod_dir, "ui"), os.path.join(target_dir, "ui"))
+    with timer.step("CreatePRCXML"):
+        rs.CreateMergedPRCXML([(fighter, 8 + slots) for fighter in fighters], target_dir)
+    with timer.step("RenameUI"):
+        rs.RenameUI(target_dir, fighters[0], "bench")
+    return config
+
+def check_golden(name, config, golden=None):
+    # -> "match", "mismatch" or "missing"; writes `golden` (the baseline's config) first when given
+    path = os.path.join(GOLDEN_DIR, name + ".config.json")
+    if golden is not None:
+        os.makedirs(GOLDEN_DIR, exist_ok=True)
+        with open(path, "w", encoding="utf-8", newline="\n") as f:
+            f.write(golden)
+    if not os.path.isfile(path):
+        return "missing"
+    with open(path, "r", encoding="utf-8") as f:
+        return "match" if f.read() == config else "mismatch"
+
+def run_case(rs, base, workdir, fighters, slots, files, repeat):
+    name = case_name(fighters, slots, files)
+    mod_dir = os.path.join(workdir, "mods", name)
+    target_dir = os.path.join(workdir, "out", name)
+    mod_files = synth.write_mod(mod_dir, fighters, slots, files)
+    # the hash list, which the baseline reads too
+    hashes = os.path.join(workdir, "Hashes_all.txt")
+    golden = None
+    if base is not None:
+        golden = baseline_config(base, mod_dir, target_dir, hashes, fighters, slots, sorted(rs.find_fighter_files(mod_dir)))
+
+    timer = Timer()
+    configs = []
+    for i in range(repeat):
+        if i == 0:
+            # cold start: nothing loaded in the process, empty cache folder
+            import cache
+            cache._resource_cache.clear()
+            rs.set_cache_dir(os.path.join(workdir, "cache", name))
+        with contextlib.redirect_stdout(io.StringIO()):
+            configs.append(run_once(rs, timer, mod_dir, target_dir, hashes, fighters, slots))
+    shutil.rmtree(mod_dir, ignore_errors=True)
+    shutil.rmtree(target_dir, ignore_errors=True)
+
+    golden = check_golden(name, configs[0], golden)
+    if any(config != configs[0] for config in configs[1:]):
+        golden = "unstable"
+    return {"name": name, "fighters": fighters, "slots": slots, "files": files, "mod_files": mod_files,
+            "repeat": repeat, "timings_ms": timer.summary(),
+            "config_entries": sum(len(v) for v in json.loads(configs[0]).values()), "golden": golden}
+
+def app_version():
+    try:
+        with open(os.path.join(REPO_DIR, "package.json"), "r", encoding="utf-8") as f:
+            return json.load(f).get("version")
+    except (OSError, ValueError):
+        return None
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def build_parser():
+    p = argparse.ArgumentParser(description="Benchmark the reslot pipeline on synthetic mods")
+    p.add_argument("--fighters", default=DEFAULT_FIGHTERS, help=f"Comma separated fighters of the fixture (default {DEFAULT_FIGHTERS})")
+    p.add_argument("--slots", default=DEFAULT_SLOTS, help=f"Comma separated slot counts, one case each (default {DEFAULT_SLOTS})")
+    p.add_argument("--files", type=int, default=20, help="Custom textures per slot (default 20)")
+    p.add_argument("--repeat", type=int, default=5, help="Runs per case; the first one is cold (default 5)")
+    p.add_argument("--out", help="Results file (default benchmarks/results/<version>-<time>.json)")
+    p.add_argument("--update-golden", action="store_true", help="Rebuild the golden config.json of every case with the baseline reslotter")
+    p.add_argument("--baseline", help=f"reslotter.py to build the golden files with (default: the one of revision {BASELINE_REVISION[:7]})")
+    return p
+
+def main():
+    args = build_parser().parse_args()
+    fighters = [f for f in args.fighters.split(",") if f]
+    try:
+        slot_counts = [int(s) for s in args.slots.split(",") if s]
+    except ValueError:
+        slot_counts = []
+    unknown = [f for f in fighters if f not in synth.FIXTURE_FIGHTERS]
+    if not fighters or unknown or not slot_counts or any(not 1 <= s <= 8 for s in slot_counts) or args.repeat < 1:
+        print(f"Fighters must be among {', '.join(synth.FIXTURE_FIGHTERS)}, slot counts between 1 and 8, repeat at least 1")
+        sys.exit(2)
+
+    rs = load_reslotter()
+    results = {"version": app_version(), "revision": git_revision(), "python": platform.python_version(),
+               "platform": platform.platform(), "started": time.strftime("%Y-%m-%dT%H:%M:%S"), "cases": []}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="reslot-bench-") as workdir:
+        prepare_workdir(workdir)
+        try:
+            base = load_baseline(args.baseline, workdir) if args.update_golden else None
+        except (OSError, RuntimeError, subprocess.SubprocessError) as e:
+            print("Could not load the baseline reslotter:", e)
+            sys.exit(2)
+        # reslotter reads the dir_info and ui_chara_db files from the working directory
+        os.chdir(workdir)
+        try:
+            for slots in slot_counts:
+                case = run_case(rs, base, workdir, fighters, slots, args.files, args.repeat)
+                results["cases"].append(case)
+                steps = ", ".join(f"{step} {t['median']:.1f}" for step, t in case["timings_ms"].items())
+                print(f"{case['name']}: {case['mod_files']} files, median ms: {steps} [{case['golden']}]")
+        finally:
+            os.chdir(cwd)
+            rs.set_cache_dir(None)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{results['version'] or 'dev'}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print("Results written to", out)
+    if any(case["golden"] in ("mismatch", "unstable") for case in results["cases"]):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# Synthetic game index and mods for the reslotter benchmarks
+#
+# Usage:
+#   Rebuild the fixture game index (benchmarks/fixtures/game):
+#     python benchmarks/synth.py game benchmarks/fixtures/game
+#   Write a mod with 4 slots of mario and the ice climbers, 20 custom textures per slot:
+#     python benchmarks/synth.py mod /tmp/my_mod --fighters mario,popo,nana --slots 4 --files 20
+#
+# Mods are laid out the way reslot_fighter_files / add_missing_files expect: fighter model and motion
+# slots, ui/replace(_patch)/chara bntx, sound banks, effects, transplant effects and camera files.
+# Everything is derived from the arguments and the seed, so the same arguments give the same mod.
+import os
+import sys
+import json
+import random
+import hashlib
+import argparse
+
+# Fighters of the fixture game index (a small slice of the real dir_info)
+FIXTURE_FIGHTERS = ("mario", "popo", "nana", "pikachu", "eflame", "elight")
+VANILLA_SLOTS = [f"c0{i}" for i in range(8)]
+
+# ui file names use these keys instead of the fighter folder name (see UI_RENAME_KEYS in reslotter.py)
+UI_NAMES = {"popo": "ice_climber", "nana": "ice_climber", "eflame": "eflame_first", "elight": "elight_first"}
+UI_CHARA = (0, 1, 2, 3, 4, 6)
+
+def vanilla_slot_files(fighter, slot):
+    # game files of one fighter slot, grouped by the dir_info folder that lists them
+    return {
+        f"fighter/{fighter}/{slot}": [
+            f"fighter/{fighter}/model/body/{slot}/model.numdlb",
+            f"fighter/{fighter}/model/body/{slot}/model.numshb",
+            f"fighter/{fighter}/model/body/{slot}/model.numatb",
+            f"fighter/{fighter}/model/body/{slot}/model.nusktb",
+            f"fighter/{fighter}/model/body/{slot}/def_{fighter}_001_col.nutexb",
+            f"fighter/{fighter}/model/body/{slot}/def_{fighter}_001_nor.nutexb",
+            f"fighter/{fighter}/model/body/{slot}/def_{fighter}_001_prm.nutexb",
+            f"fighter/{fighter}/motion/body/{slot}/motion_list.bin",
+            f"fighter/{fighter}/motion/body/{slot}/a00wait1.nuanmb",
+            f"sound/bank/fighter/se_{fighter}_{slot}.nus3audio",
+            f"sound/bank/fighter_voice/vc_{fighter}_{slot}.nus3audio",
+        ],
+        f"fighter/{fighter}/camera/{slot}": [
+            f"camera/fighter/{fighter}/{slot}/j02win1.nuanmb",
+            f"camera/fighter/{fighter}/{slot}/j02win2.nuanmb",
+        ],
+        f"fighter/{fighter}/kirbycopy/{slot}": [
+            f"fighter/kirby/model/copy_{fighter}_cap/{slot}/model.numdlb",
+            f"fighter/kirby/model/copy_{fighter}_cap/{slot}/def_kirby_copy_{fighter}_col.nutexb",
+        ],
+    }
+
+def build_game_index(fighters=FIXTURE_FIGHTERS):
+    # -> (dir_info dict as in dir_info_with_files_trimmed.json, hash list)
+    file_array = []
+    def node():
+        return {"directories": {}, "files": []}
+    def add(folder, path):
+        folder["files"].append(len(file_array))
+        file_array.append(path)
+
+    dirs = node()
+    fighter_root = node()
+    dirs["directories"]["fighter"] = fighter_root
+    for fighter in fighters:
+        fighter_dir = node()
+        fighter_root["directories"][fighter] = fighter_dir
+        for group in ("camera", "kirbycopy"):
+            fighter_dir["directories"][group] = node()
+        for slot in VANILLA_SLOTS:
+            slot_dir = node()
+            fighter_dir["directories"][slot] = slot_dir
+            for part in ("body", "motion"):
+                slot_dir["directories"][part] = node()
+            for folder, paths in vanilla_slot_files(fighter, slot).items():
+                if folder.endswith(f"/{fighter}/{slot}"):
+                    target = slot_dir
+                else:
+                    target = node()
+                    fighter_dir["directories"][folder.split("/")[2]]["directories"][slot] = target
+                for path in paths:
+                    add(target, path)
+                # hash-only entries (unknown paths) are listed as hex strings
+                add(target, "0x" + hashlib.blake2b(folder.encode("utf-8"), digest_size=5).hexdigest())
+    hashes = [path for path in file_array if not path.startswith("0x")]
+    return {"dirs": dirs, "file_array": file_array}, hashes
+
+def write_game_index(out_dir, fighters=FIXTURE_FIGHTERS):
+    os.makedirs(out_dir, exist_ok=True)
+    dir_info, hashes = build_game_index(fighters)
+    with open(os.path.join(out_dir, "dir_info_with_files_trimmed.json"), "w", encoding="utf-8") as f:
+        json.dump(dir_info, f, separators=(",", ":"))
+    with open(os.path.join(out_dir, "Hashes_all.txt"), "w", encoding="utf-8", newline="\n") as f:
+        f.write("".join(path + "\n" for path in hashes))
+    return out_dir
+
+def mod_files(fighters, slots, files, seed=0):
+    # -> [(mod relative path, size)] for a mod replacing the first `slots` slots of every fighter
+    rng = random.Random(seed)
+    out = []
+    for fighter in fighters:
+        for slot in VANILLA_SLOTS[:slots]:
+            for paths in vanilla_slot_files(fighter, slot).values():
+                out += [(path, rng.randint(256, 4096)) for path in paths]
+            # custom textures and models that aren't in the game
+            for i in range(files):
+                kind = ("col", "nor", "prm", "emi")[i % 4]
+                out.append((f"fighter/{fighter}/model/body/{slot}/custom_{fighter}_{i:03d}_{kind}.nutexb", rng.randint(1024, 16384)))
+            out.append((f"fighter/{fighter}/model/hair/{slot}/model.numdlb", rng.randint(256, 4096)))
+            out.append((f"effect/fighter/{fighter}/ef_{fighter}_{slot}.eff", rng.randint(256, 4096)))
+            number = slot[1:]
+            ui_name = UI_NAMES.get(fighter, fighter)
+            for chara in UI_CHARA:
+                out.append((f"ui/replace/chara/chara_{chara}/chara_{chara}_{ui_name}_{number}.bntx", rng.randint(1024, 8192)))
+            out.append((f"ui/replace_patch/chara/chara_7/chara_7_{ui_name}_{number}.bntx", rng.randint(1024, 8192)))
+        out.append((f"effect/fighter/{fighter}/transplant/ef_{fighter}.eff", rng.randint(256, 4096)))
+    out += [("info.toml", 64), ("preview.webp", 2048)]
+    # ui files are shared between grouped fighters
+    return list(dict(out).items())
+
+def write_mod(out_dir, fighters, slots, files, seed=0):
+    # -> number of files written
+    written = 0
+    for path, size in mod_files(fighters, slots, files, seed):
+        full = os.path.join(out_dir, *path.split("/"))
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        with open(full, "wb") as f:
+            f.write((path.encode("utf-8") + b"\n") * (size // (len(path) + 1) + 1))
+        written += 1
+    return written
+
+def build_parser():
+    p = argparse.ArgumentParser(description="Synthetic game index and mods for the reslotter benchmarks")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    game = sub.add_parser("game", help="Write the fixture game index")
+    game.add_argument("out")
+    game.add_argument("--fighters", default=",".join(FIXTURE_FIGHTERS))
+    mod = sub.add_parser("mod", help="Write a synthetic mod")
+    mod.add_argument("out")
+    mod.add_argument("--fighters", default="mario")
+    mod.add_argument("--slots", type=int, default=8, help="Replaced vanilla slots per fighter (1-8)")
+    mod.add_argument("--files", type=int, default=20, help="Custom textures per slot")
+    mod.add_argument("--seed", type=int, default=0)
+    return p
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    fighters = [f for f in args.fighters.split(",") if f]
+    if args.cmd == "game":
+        print(write_game_index(args.out, fighters))
+    else:
+        if not 1 <= args.slots <= 8:
+            print("--slots must be between 1 and 8")
+            sys.exit(2)
+        print(f"Wrote {write_mod(args.out, fighters, args.slots, args.files, args.seed)} files to {args.out}")
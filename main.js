@@ -51,6 +51,155 @@ try {
         return null;
     };
 
+    // Compiled game indexes and scan caches are kept here between runs (reslotter.py --cache-dir)
+    const getReslotCacheDir = () => require('path').join(require('electron').app.getPath('userData'), 'reslot-cache');
+    const reslotEnv = () => ({ ...process.env, RESLOT_CACHE_DIR: getReslotCacheDir() });
+
+    // Python can't read inside app.asar: unpack the reslot folder into the cache once per content
+    // (keyed on a hash of every file in it) and reuse it from then on
+    const RESLOT_UNPACK_GRACE_MS = 7 * 24 * 60 * 60 * 1000; // unpacked folders unused this long are removed
+    const reslotResourceKeys = new Map();
+    const hashReslotResources = async (srcDir) => {
+        const path = require('path');
+        const fs = require('fs');
+        const crypto = require('crypto');
+        const hash = crypto.createHash('sha1');
+        const walk = async (dir, rel) => {
+            for (const name of (await fs.promises.readdir(dir)).sort()) {
+                const full = path.join(dir, name);
+                const st = await fs.promises.stat(full);
+                if (st.isDirectory()) {
+                    await walk(full, `${rel}${name}/`);
+                    continue;
+                }
+                hash.update(`\n${rel}${name}:${st.size}\n`);
+                await new Promise((resolve, reject) => {
+                    fs.createReadStream(full).on('data', (d) => hash.update(d)).on('end', resolve).on('error', reject);
+                });
+            }
+        };
+        await walk(srcDir, '');
+        return hash.digest('hex').slice(0, 16);
+    };
+    const unpackReslotResources = async (srcDir) => {
+        const path = require('path');
+        const fs = require('fs');
+        const fse = require('fs-extra');
+        const cacheDir = getReslotCacheDir();
+        // the archive can't change while the app runs: hash it once per process
+        if (!reslotResourceKeys.has(srcDir)) reslotResourceKeys.set(srcDir, await hashReslotResources(srcDir));
+        const target = path.join(cacheDir, `resources-${reslotResourceKeys.get(srcDir)}`);
+        const now = new Date();
+        if (fs.existsSync(path.join(target, 'reslotter.py'))) {
+            // mark it in use, so other instances' cleanup leaves it alone
+            await fs.promises.utimes(target, now, now).catch(() => {});
+            return target;
+        }
+
+        // copy next to the target and rename it into place, so a half-copied folder is never used
+        try { log.info('[reslotter] Script in ASAR, unpacking to:', target); } catch {}
+        await fs.promises.mkdir(cacheDir, { recursive: true });
+        const staging = `${target}.tmp-${process.pid}`;
+        await fse.copy(srcDir, staging, { overwrite: true });
+        try {
+            await fs.promises.rename(staging, target);
+        } catch (e) {
+            await fse.remove(staging).catch(() => {});
+            if (!fs.existsSync(path.join(target, 'reslotter.py'))) throw e;
+        }
+        await fs.promises.utimes(target, now, now).catch(() => {});
+        // drop folders unpacked by other versions, and the per-session temp copies older builds left behind,
+        // once nothing has used them for the grace period (another instance may still run from them)
+        const removeUnused = async (dir, prefix, keep) => {
+            for (const name of await fs.promises.readdir(dir).catch(() => [])) {
+                if (!name.startsWith(prefix) || name === keep) continue;
+                const full = path.join(dir, name);
+                const st = await fs.promises.stat(full).catch(() => null);
+                if (st && now - st.mtime > RESLOT_UNPACK_GRACE_MS) await fse.remove(full).catch(() => {});
+            }
+        };
+        await removeUnused(cacheDir, 'resources-', path.basename(target));
+        await removeUnused(require('os').tmpdir(), 'fp-reslot-', null);
+        return target;
+    };
+
+    // Persistent reslotter worker (reslotter.py serve): keeps the game indexes loaded between runs
+    let reslotDaemon = null;
+    // a request that gets no answer or progress event for this long is given up and the worker restarted
+    const RESLOT_REQUEST_TIMEOUT_MS = 10 * 60 * 1000;
+    const getReslotDaemon = (resolvedPy, scriptRunPath, scriptDir) => {
+        if (reslotDaemon && !reslotDaemon.closed && reslotDaemon.scriptRunPath === scriptRunPath) return reslotDaemon;
+        if (reslotDaemon) { try { reslotDaemon.child.kill(); } catch {} }
+        const { spawn } = require('child_process');
+        const child = spawn(resolvedPy.cmd, [...resolvedPy.baseArgs, scriptRunPath, 'serve'], { cwd: scriptDir, env: reslotEnv() });
+        const daemon = { child, scriptRunPath, pending: new Map(), nextId: 1, buffer: '', closed: false };
+        // errors carry reachedWorker: once the request was written, the worker may have started the reslot
+        const settle = (id, err, result) => {
+            const entry = daemon.pending.get(id);
+            if (!entry) return;
+            daemon.pending.delete(id);
+            clearTimeout(entry.timer);
+            if (err) entry.reject(Object.assign(err, { reachedWorker: entry.sent }));
+            else entry.resolve(result);
+        };
+        child.stdout.on('data', (d) => {
+            daemon.buffer += d.toString();
+            let newline;
+            while ((newline = daemon.buffer.indexOf('\n')) >= 0) {
+                const line = daemon.buffer.slice(0, newline).trim();
+                daemon.buffer = daemon.buffer.slice(newline + 1);
+                if (!line) continue;
+                let message;
+                try { message = JSON.parse(line); } catch { continue; }
+                if (message.method === 'event' && message.params) {
+                    // stage/progress notification of a running request
+                    const owner = daemon.pending.get(message.params.id);
+                    if (owner) owner.arm();
+                    if (owner && owner.onEvent) { try { owner.onEvent(message.params); } catch {} }
+                    continue;
+                }
+                if (message.id == null) continue;
+                settle(message.id, message.error ? new Error(message.error.message) : null, message.result);
+            }
+        });
+        child.stderr.on('data', (d) => { try { log.warn('[reslotter] worker stderr:', d.toString().slice(0, 4000)); } catch {} });
+        const fail = (err) => {
+            daemon.closed = true;
+            for (const id of [...daemon.pending.keys()]) settle(id, new Error(err.message));
+            if (reslotDaemon === daemon) reslotDaemon = null;
+        };
+        child.on('error', fail);
+        child.on('close', (code) => fail(new Error(`reslotter worker exited (code ${code})`)));
+        // write errors (worker gone) are reported through the write callback and 'close'
+        child.stdin.on('error', () => {});
+        daemon.request = (method, params, onEvent) => new Promise((resolve, reject) => {
+            if (daemon.closed) return reject(new Error('reslotter worker is not running'));
+            const id = daemon.nextId++;
+            const entry = { resolve, reject, onEvent, sent: false, timer: null };
+            entry.arm = () => {
+                clearTimeout(entry.timer);
+                entry.timer = setTimeout(() => {
+                    settle(id, new Error(`reslotter worker did not answer within ${RESLOT_REQUEST_TIMEOUT_MS / 1000}s`));
+                    // the worker is stuck on this request: the next one gets a new worker
+                    fail(new Error('reslotter worker restarted after a timeout'));
+                    try { child.kill(); } catch {}
+                }, RESLOT_REQUEST_TIMEOUT_MS);
+            };
+            daemon.pending.set(id, entry);
+            entry.arm();
+            const payload = onEvent ? { ...params, events: true } : params;
+            child.stdin.write(JSON.stringify({ jsonrpc: '2.0', id, method, params: payload }) + '\n', (err) => {
+                if (err) settle(id, new Error(`could not send the request to the reslotter worker: ${err.message}`));
+                else entry.sent = true;
+            });
+        });
+        reslotDaemon = daemon;
+        return daemon;
+    };
+    require('electron').app.on('will-quit', () => {
+        if (reslotDaemon) { try { reslotDaemon.child.kill(); } catch {} }
+    });
+
     // Check Python availability
     ipcMainReslot.handle('check-python', async () => {
         try {
@@ -120,27 +269,19 @@ try {
             }
             try { log.info('[reslotter] Using script (original):', scriptPath); log.info('[reslotter] Using hashes:', hashesPath); } catch {}
 
-            // If the script is inside an ASAR archive, copy the whole reslot folder to a temp dir
+            // If the script is inside an ASAR archive, run the copy unpacked into the cache
             if (scriptPath.includes('.asar')) {
-                const os = require('os');
-                const fse = require('fs-extra');
-                const tmpRoot = await fs.promises.mkdtemp(path.join(os.tmpdir(), 'fp-reslot-'));
-                const tmpReslotDir = path.join(tmpRoot, 'reslot');
-                try { log.info('[reslotter] Script in ASAR, copying to temp:', tmpReslotDir); } catch {}
-                await fse.copy(scriptDir, tmpReslotDir, { overwrite: true });
-                scriptDir = tmpReslotDir;
+                scriptDir = await unpackReslotResources(scriptDir);
                 hashesPath = path.join(scriptDir, 'dir_info_with_files_trimmed.json');
                 scriptRunPath = path.join(scriptDir, 'reslotter.py');
-                try { log.info('[reslotter] Temp script dir:', scriptDir); log.info('[reslotter] Temp hashes path:', hashesPath); } catch {}
+                try { log.info('[reslotter] Unpacked script dir:', scriptDir); log.info('[reslotter] Unpacked hashes path:', hashesPath); } catch {}
             }
 
             const resolvedPy = await resolvePython();
             if (!resolvedPy) {
                 throw new Error('No Python interpreter found. Ensure python is installed and on PATH.');
             }
-            const args = [
-                ...resolvedPy.baseArgs,
-                scriptRunPath,
+            const legacyArgs = [
                 modDirectory,
                 hashesPath,
                 String(fighterName),
@@ -150,9 +291,32 @@ try {
                 outDirectory || modDirectory,
             ];
 
+            try {
+                const daemon = getReslotDaemon(resolvedPy, scriptRunPath, scriptDir);
+                log.info(logPrefix, 'Running via worker:', legacyArgs.join(' '));
+                const onEvent = (ev) => {
+                    if (ev.event === 'stage' && ev.status !== 'start') {
+                        const { id, event: _e, stage, status, elapsed_ms, ...counts } = ev;
+                        log.info(logPrefix, `stage ${stage} ${status} in ${elapsed_ms}ms`, JSON.stringify(counts));
+                    }
+                    try { event.sender.send('reslotter-event', ev); } catch {}
+                };
+                const result = await daemon.request('legacy', { argv: legacyArgs }, onEvent);
+                log.info(logPrefix, 'Exit code:', result.exitCode);
+                if (result.output) log.info(logPrefix, 'stdout:', result.output.slice(0, 4000));
+                return { exitCode: result.exitCode, stdout: result.output || '', stderr: '' };
+            } catch (e) {
+                // the worker may have written part of the output already: running the reslot again
+                // over a half-written folder could do more harm, so only unsent requests fall back
+                if (e.reachedWorker) throw e;
+                log.warn(logPrefix, 'Worker unavailable, falling back to a one-shot process:', e.message);
+            }
+
+            const args = [...resolvedPy.baseArgs, scriptRunPath, ...legacyArgs];
+
             log.info(logPrefix, 'Running:', resolvedPy.cmd, args.map(a => (typeof a === 'string' ? a : String(a))).join(' '));
 
-            const child = spawn(resolvedPy.cmd, args, { cwd: scriptDir, env: process.env });
+            const child = spawn(resolvedPy.cmd, args, { cwd: scriptDir, env: reslotEnv() });
             let stdout = '';
             let stderr = '';
             child.stdout.on('data', (d) => { stdout += d.toString(); });
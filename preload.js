@@ -118,6 +118,13 @@ contextBridge.exposeInMainWorld('api', {
     },
     reslotter: {
         run: (payload) => ipcRenderer.invoke('run-reslotter', payload),
+        // stage/progress events of the running reslot: { event: 'stage'|'progress', stage, ... };
+        // returns a function that removes the listener again
+        onEvent: (callback) => {
+            const listener = (_, data) => callback(data);
+            ipcRenderer.on('reslotter-event', listener);
+            return () => ipcRenderer.removeListener('reslotter-event', listener);
+        },
         checkPython: () => ipcRenderer.invoke('check-python')
     },
     settings: {
@@ -0,0 +1,200 @@
+# Mod archives: reading a .zip / .fpp / .7z as a mod folder, and writing a result as one.
+import os
+import json
+import shutil
+import tempfile
+
+from events import count
+from helpers import fix_windows_path
+from modindex import ModIndex, _mod_indexes
+
+# --------------------------
+# Mod archives (.zip / .fpp / .7z used as --mod-dir without extracting them)
+# --------------------------
+# The entry list is read from the archive index. A staging folder gets the mod's directory tree and
+# its metadata files; the entries a plan actually copies are extracted into it just before placing.
+MOD_ARCHIVE_EXTENSIONS = (".zip", ".fpp", ".7z")
+MOD_METADATA_FILES = ("config.json", "info.toml", "preview.webp")
+
+def is_mod_archive(path):
+    return os.path.isfile(path) and os.path.splitext(path)[1].lower() in MOD_ARCHIVE_EXTENSIONS
+
+def _find_7z():
+    bundled = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bin", "7z.exe")
+    if os.name == "nt" and os.path.isfile(bundled):
+        return bundled
+    for name in ("7z", "7za", "7zz"):
+        found = shutil.which(name)
+        if found:
+            return found
+    return None
+
+class ModArchive:
+    def __init__(self, path, root=None):
+        self.path = os.path.abspath(path)
+        self.is_7z = self.path.lower().endswith(".7z")
+        self.staging = None
+        self._py7zr = None
+        if self.is_7z:
+            try:
+                import py7zr
+                self._py7zr = py7zr
+            except ImportError:
+                self._7z = _find_7z()
+                if self._7z is None:
+                    raise ValueError("Reading .7z mods needs the py7zr package or a 7z executable")
+        # normalized name -> name as stored in the archive, and its uncompressed size
+        self.entries = {}
+        self.sizes = {}
+        for name, size in self._list():
+            if not name.endswith(("/", "\\")):
+                self.entries[fix_windows_path(name, True)] = name
+                self.sizes[fix_windows_path(name, True)] = size
+        self.root = self._find_root(root)
+        # stored order, which for archives made from a folder is the order the folder was walked in
+        self.files = [name[len(self.root):] for name in self.entries if name.startswith(self.root)]
+
+    def _list(self):
+        import subprocess, zipfile
+        if not self.is_7z:
+            with zipfile.ZipFile(self.path) as zf:
+                return [(info.filename, info.file_size) for info in zf.infolist() if not info.is_dir()]
+        if self._py7zr is not None:
+            with self._py7zr.SevenZipFile(self.path, "r") as zf:
+                return [(info.filename, info.uncompressed) for info in zf.list() if not info.is_directory]
+        listing = subprocess.run([self._7z, "l", "-slt", "-ba", "-sccUTF-8", self.path], check=True,
+                                 stdout=subprocess.PIPE).stdout.decode("utf-8", errors="replace")
+        names = []
+        for block in listing.split("\n\n"):
+            fields = dict(line.split(" = ", 1) for line in block.splitlines() if " = " in line)
+            if "Path" in fields and fields.get("Folder") != "+" and not fields.get("Attributes", "").startswith("D"):
+                names.append((fields["Path"], int(fields.get("Size") or 0)))
+        return names
+
+    def _find_root(self, root):
+        # the mod root is the shallowest folder holding fighter/, sound/ or ui/ (data/mods/<id>/ in an .fpp)
+        if root:
+            root = fix_windows_path(root, True).strip("/") + "/"
+            if not any(name.startswith(root) for name in self.entries):
+                raise ValueError(f"'{root}' is not a folder of {os.path.basename(self.path)}")
+            return root
+        roots = set()
+        for name in self.entries:
+            parts = name.split("/")
+            for i, part in enumerate(parts[:-1]):
+                if part.lower() in ("fighter", "sound", "ui"):
+                    roots.add("".join(p + "/" for p in parts[:i]))
+                    break
+        if not roots:
+            raise ValueError("The archive doesn't appear to contain a mod. It must contain the 'fighter', 'sound', or 'ui' folders.")
+        depth = min(r.count("/") for r in roots)
+        roots = sorted(r for r in roots if r.count("/") == depth)
+        if len(roots) > 1:
+            raise ValueError("The archive contains several mods, pick one with --archive-root: " + ", ".join(roots))
+        return roots[0]
+
+    @property
+    def output_base(self):
+        # where results go: the archive itself is never modified
+        name = os.path.basename(self.root.rstrip("/")) if self.root else os.path.splitext(os.path.basename(self.path))[0]
+        return os.path.join(os.path.dirname(self.path), name)
+
+    def stage(self):
+        try:
+            self.staging = tempfile.mkdtemp(prefix=".reslot-", dir=os.path.dirname(self.path))
+        except OSError:
+            self.staging = tempfile.mkdtemp(prefix="reslot-")
+        mod_dir = os.path.normpath(os.path.join(self.staging, fix_windows_path(self.root, False)))
+        for dir_name in sorted({os.path.dirname(f) for f in self.files}):
+            os.makedirs(os.path.join(mod_dir, fix_windows_path(dir_name, False)), exist_ok=True)
+        self.extract([f for f in self.files if f in MOD_METADATA_FILES])
+        # scans of the staging folder read the archive's entry list instead of the (mostly empty) tree
+        _mod_indexes[mod_dir] = ModIndex.from_files(mod_dir, self.files, {f: self.sizes[self.root + f] for f in self.files})
+        count("files_scanned", len(self.files))
+        return mod_dir
+
+    def extract(self, files):
+        # extract mod-relative paths into the staging folder, streaming each entry
+        names = {self.entries[self.root + f]: f for f in files if self.root + f in self.entries}
+        for name in names:
+            if ".." in fix_windows_path(name, True).split("/"):
+                raise ValueError(f"Unsafe path in archive: {name}")
+        if not names:
+            return 0
+        import subprocess, zipfile
+        if not self.is_7z:
+            with zipfile.ZipFile(self.path) as zf:
+                for name in names:
+                    dst = os.path.join(self.staging, fix_windows_path(fix_windows_path(name, True), False))
+                    os.makedirs(os.path.dirname(dst), exist_ok=True)
+                    with zf.open(name) as src, open(dst, "wb") as out:
+                        shutil.copyfileobj(src, out, 1 << 20)
+        elif self._py7zr is not None:
+            with self._py7zr.SevenZipFile(self.path, "r") as zf:
+                zf.extract(path=self.staging, targets=list(names))
+        else:
+            list_file = os.path.join(self.staging, ".reslot-extract.txt")
+            with open(list_file, "w", encoding="utf-8") as f:
+                f.write("\n".join(names))
+            subprocess.run([self._7z, "x", "-y", "-scsUTF-8", f"-o{self.staging}", self.path, f"@{list_file}"],
+                           check=True, stdout=subprocess.DEVNULL)
+            os.remove(list_file)
+        return len(names)
+
+    def extract_sources(self, copies, mod_dir):
+        # extract the archive entries a list of planned (src, dst) copies reads from
+        prefix = os.path.join(mod_dir, "")
+        return self.extract(list(dict.fromkeys(fix_windows_path(src[len(prefix):], True) for src, _ in copies if src.startswith(prefix))))
+
+    def size(self, path):
+        # size of a staged file, extracted or not
+        relative = fix_windows_path(os.path.relpath(path, os.path.join(self.staging, fix_windows_path(self.root, False))), True)
+        return self.sizes.get(self.root + relative) if self.root + relative in self.sizes else os.path.getsize(path)
+
+    def close(self):
+        if self.staging:
+            shutil.rmtree(self.staging, ignore_errors=True)
+            self.staging = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# --------------------------
+# Archive output (--out-archive)
+# --------------------------
+# Formats that are already compressed are stored as-is instead of being deflated again.
+STORED_EXTENSIONS = {".webp", ".png", ".jpg", ".jpeg", ".nus3audio", ".zip", ".7z", ".rar", ".fpp", ".mp4", ".webm", ".ogg", ".mp3"}
+
+def write_archive(out_path, files, target_dir, config, generated=()):
+    # Stream files ({dst: src}, in entry order) into a zip, or an .fpp package, named by their path
+    # relative to target_dir. generated: [(relative path, write(f))] entries written by a function.
+    import datetime, zipfile
+    prefix = ""
+    name = os.path.splitext(os.path.basename(out_path))[0]
+    if out_path.lower().endswith(".fpp"):
+        # same layout createFPP.js produces
+        prefix = f"data/mods/{name}/"
+
+    stats = {"files": 0, "bytes": 0, "stored": 0, "deflated": 0}
+    tmp_path = out_path + ".tmp"
+    with zipfile.ZipFile(tmp_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        if prefix:
+            manifest = {"version": 1, "name": name, "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                        "files": [], "directories": [f"mods/{name}"]}
+            zf.writestr("manifest.json", json.dumps(manifest, indent=2))
+        for dst, src in files.items():
+            arcname = prefix + fix_windows_path(os.path.relpath(dst, target_dir), True)
+            stored = os.path.splitext(src)[1].lower() in STORED_EXTENSIONS
+            zf.write(src, arcname, compress_type=zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED)
+            stats["stored" if stored else "deflated"] += 1
+            stats["files"] += 1
+            stats["bytes"] += os.path.getsize(src)
+        for rel, write in generated:
+            with zf.open(prefix + rel, "w") as f:
+                write(f)
+        zf.writestr(prefix + "config.json", json.dumps(config, ensure_ascii=False, indent=4).encode("utf-8"))
+    os.replace(tmp_path, out_path)
+    return stats
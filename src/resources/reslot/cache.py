@@ -0,0 +1,420 @@
+# Game resources (known-file list, dir_info) and their compiled, memory-mapped forms, built once
+# into the cache folder and reused across runs and processes.
+import os
+import sys
+import json
+import time
+import mmap
+import array
+import zlib
+import bisect
+import struct
+import hashlib
+import tempfile
+
+# --------------------------
+# Game resources
+# --------------------------
+# Game resources are cached for the lifetime of the process and reused as long as
+# the file on disk is unchanged (serve mode handles many requests per process).
+DIR_INFO_FILE = "dir_info_with_files_trimmed.json"
+_resource_cache = {}
+
+def _cached_resource(path, loader):
+    try:
+        st = os.stat(path)
+        stamp = (st.st_size, st.st_mtime_ns)
+    except OSError:
+        stamp = None
+    key = (loader.__name__, os.path.abspath(path))
+    cached = _resource_cache.get(key)
+    if cached is not None and stamp is not None and cached[0] == stamp:
+        return cached[1]
+    value = loader(path)
+    _resource_cache[key] = (stamp, value)
+    return value
+
+def _load_dir_info(dir_info_file):
+    with open(dir_info_file, "r", encoding='utf-8') as f:
+        res = json.load(f)
+    return res["dirs"], res["file_array"]
+
+def load_dir_info(dir_info_file=DIR_INFO_FILE):
+    # Prefer the compiled index (see compile-index), built once into the cache folder
+    if sys.byteorder == "little" and os.path.isfile(dir_info_file):
+        try:
+            compiled = _cached_resource(cached_build(dir_info_file, ".bin", compile_dir_info), CompiledDirInfo)
+            return compiled.dirs, compiled.file_array
+        except (OSError, ValueError) as e:
+            print(f"Warning: could not use the cached index of {dir_info_file}: {e}")
+    return _cached_resource(dir_info_file, _load_dir_info)
+
+def is_dir_info_file(hashes_file):
+    # The app passes dir_info_with_files_trimmed.json where a Hashes_all.txt is expected
+    return hashes_file.lower().endswith(".json")
+
+def game_dir_info_file(hashes_file):
+    # The dir_info json a run reads: the one given as the hash list, or the one next to the program
+    return hashes_file if is_dir_info_file(hashes_file) else DIR_INFO_FILE
+
+# --------------------------
+# Resource cache (--cache-dir)
+# --------------------------
+# Fast-load forms of the game resources (.h40, .bin) and the mod/library scan caches live here,
+# never next to the (possibly read-only) resources or in a user's game dump:
+#   <cache dir>/v<RESOURCE_CACHE_VERSION>/<resource name>-<content key><suffix>
+# Without --cache-dir the same layout is used in <temp folder>/reslot-cache-v<RESOURCE_CACHE_VERSION>.
+# Entries are keyed on the content of their source, so they never go stale; they are built once
+# under a lock file and written atomically, so concurrent processes can share the folder.
+RESOURCE_CACHE_VERSION = 2
+CACHE_LOCK_TIMEOUT = 120  # seconds to wait for another process building the same entry
+CACHE_LOCK_STALE = 600  # a lock file older than this was left behind by a crashed process
+CACHE_DIR = os.environ.get("RESLOT_CACHE_DIR") or None
+
+def set_cache_dir(path):
+    global CACHE_DIR
+    CACHE_DIR = os.path.abspath(path) if path else None
+    # worker processes started with "spawn" (Windows) only see the environment
+    if CACHE_DIR:
+        os.environ["RESLOT_CACHE_DIR"] = CACHE_DIR
+
+def cache_root():
+    # where cache files go: the versioned cache folder, or one in the temp folder without --cache-dir
+    if CACHE_DIR:
+        root = os.path.join(CACHE_DIR, f"v{RESOURCE_CACHE_VERSION}")
+    else:
+        root = os.path.join(tempfile.gettempdir(), f"reslot-cache-v{RESOURCE_CACHE_VERSION}")
+    os.makedirs(root, exist_ok=True)
+    return root
+
+def cache_path(source, suffix):
+    size, digest = _source_fingerprint(source)
+    key = hashlib.blake2b(digest + size.to_bytes(8, "little"), digest_size=10).hexdigest()
+    return os.path.join(cache_root(), f"{os.path.splitext(os.path.basename(source))[0]}-{key}{suffix}")
+
+class CacheLock:
+    # Lock file next to a cache entry (O_EXCL create works the same on every platform)
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        deadline = time.monotonic() + CACHE_LOCK_TIMEOUT
+        while True:
+            try:
+                fd = os.open(self.path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(fd, str(os.getpid()).encode())
+                os.close(fd)
+                return self
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(self.path) > CACHE_LOCK_STALE:
+                        os.remove(self.path)
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Timed out waiting for {self.path}")
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+def cached_build(source, suffix, build):
+    # Path of the cache entry built from source by build(source, out_file), building it if needed
+    path = cache_path(source, suffix)
+    if not os.path.isfile(path):
+        with CacheLock(path + ".lock"):
+            if not os.path.isfile(path):
+                build(source, path)
+    return path
+
+# --------------------------
+# Known-file index (sorted hash40 values instead of a set of path strings)
+# --------------------------
+# Built into the cache folder (Hashes_all.txt -> <cache>/Hashes_all-<content key>.h40):
+#   header  magic, version, source size, source fingerprint, count
+#   values  sorted unique u64 hash40 values
+# A changed hash list gets a new content key, so its index is rebuilt automatically.
+# A dir_info json given as the hash list is indexed by its file_array paths.
+HASH_INDEX_MAGIC = b"FPH4"
+HASH_INDEX_VERSION = 2
+_HASH_INDEX_HEADER = struct.Struct("<4sIQ32sQ")
+
+def hash40(path):
+    # Same identifier the game uses for paths: crc32 in the low 32 bits, byte length above it
+    data = path.encode("utf-8")
+    return (len(data) << 32) | zlib.crc32(data)
+
+def build_hash_index(hashes_file, out_file):
+    source_size, source_digest = _source_fingerprint(hashes_file)
+    if is_dir_info_file(hashes_file):
+        # the same parse (or compiled index) core_init uses for the directory tree
+        _, paths = load_dir_info(hashes_file)
+        values = array.array("Q", sorted(set(hash40(path) for path in paths)))
+    else:
+        with open(hashes_file, 'r', encoding='utf-8', errors='ignore') as f:
+            values = array.array("Q", sorted(set(hash40(line.strip()) for line in f)))
+    if sys.byteorder != "little":
+        values.byteswap()
+    tmp_file = f"{out_file}.{os.getpid()}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(_HASH_INDEX_HEADER.pack(HASH_INDEX_MAGIC, HASH_INDEX_VERSION, source_size, source_digest, len(values)))
+        f.write(values.tobytes())
+    os.replace(tmp_file, out_file)
+
+class KnownFileIndex:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.source_size, self.source_digest, count = _HASH_INDEX_HEADER.unpack_from(self._map, 0)
+        if magic != HASH_INDEX_MAGIC or version != HASH_INDEX_VERSION:
+            raise ValueError("not a known-file index (or wrong version)")
+        start = _HASH_INDEX_HEADER.size
+        if len(self._map) != start + 8 * count:
+            raise ValueError("truncated known-file index")
+        if sys.byteorder == "little":
+            self._values = memoryview(self._map)[start:].cast("Q")
+        else:
+            self._values = array.array("Q", self._map[start:])
+            self._values.byteswap()
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, path):
+        value = hash40(path)
+        i = bisect.bisect_left(self._values, value)
+        return i < len(self._values) and self._values[i] == value
+
+def _load_known_files(hashes_file):
+    return KnownFileIndex(cached_build(hashes_file, ".h40", build_hash_index))
+
+# --------------------------
+# Compiled dir_info index (memory-mapped, read lazily)
+# --------------------------
+# Layout (little-endian):
+#   header      magic, version, source size, source fingerprint, table counts and offsets
+#   strings     u32 offsets[n_strings + 1] into a utf-8 blob; string i == file_array[i] for i < n_files,
+#               directory names are interned after the file paths
+#   nodes       u32 [name, first_child, child_count, first_file, file_count] per directory, breadth-first,
+#               so the children of a node are a contiguous node range in their original json order
+#   file refs   u32 indexes into file_array, one contiguous range per node
+DIR_INFO_MAGIC = b"FPDI"
+DIR_INFO_VERSION = 1
+_DIR_INFO_HEADER = struct.Struct("<4sIQ32sIIIIQQQQQ")
+
+# An mtime within this of a scan may not move on the next edit: FAT/exFAT (SD cards) keep mtimes to 2 seconds
+MOD_INDEX_RACY_NS = 2 * 10**9
+
+# (path, size, mtime_ns) -> digest of the whole file; also kept in <cache dir>/fingerprints.json
+_fingerprints = {}
+
+def _source_fingerprint(path):
+    # size + digest of the whole file, so any edit rebuilds the compiled forms. The file is read
+    # once per (size, mtime): the digest is remembered for the process, and across runs with --cache-dir.
+    st = os.stat(path)
+    key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+    digest = _fingerprints.get(key)
+    if digest is None:
+        stored = _load_fingerprints()
+        entry = stored.get(key[0])
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            digest = bytes.fromhex(entry[2])
+        else:
+            hasher = hashlib.blake2b(digest_size=32)
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    hasher.update(block)
+            digest = hasher.digest()
+            # an mtime this recent may not change on the next edit (coarse file system clocks)
+            if CACHE_DIR and time.time_ns() - st.st_mtime_ns > MOD_INDEX_RACY_NS:
+                stored[key[0]] = [st.st_size, st.st_mtime_ns, digest.hex()]
+                _save_fingerprints(stored)
+        _fingerprints[key] = digest
+    return st.st_size, digest
+
+def _fingerprints_file():
+    return os.path.join(cache_root(), "fingerprints.json")
+
+def _load_fingerprints():
+    if not CACHE_DIR:
+        return {}
+    try:
+        with open(_fingerprints_file(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_fingerprints(stored):
+    # last writer wins: an entry lost to a concurrent run is just computed again
+    path = _fingerprints_file()
+    try:
+        with open(f"{path}.{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+            json.dump(stored, f, ensure_ascii=False)
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+    except OSError:
+        pass
+
+def _u32_bytes(values):
+    table = array.array("I", values)
+    if sys.byteorder != "little":
+        table.byteswap()
+    return table.tobytes()
+
+def compile_dir_info(json_file, out_file):
+    source_size, source_digest = _source_fingerprint(json_file)
+    dirs, files = _load_dir_info(json_file)
+
+    strings = list(files)
+    string_ids = {}
+    for i, value in enumerate(strings):
+        string_ids.setdefault(value, i)
+
+    def intern(value):
+        if value not in string_ids:
+            string_ids[value] = len(strings)
+            strings.append(value)
+        return string_ids[value]
+
+    nodes = []
+    file_refs = []
+    queue = [("", dirs)]
+    position = 0
+    while position < len(queue):
+        name, node = queue[position]
+        position += 1
+        children = node.get("directories", {})
+        node_files = node.get("files", [])
+        nodes += [intern(name), len(queue), len(children), len(file_refs), len(node_files)]
+        file_refs.extend(node_files)
+        queue.extend(children.items())
+
+    blob = bytearray()
+    offsets = [0]
+    for value in strings:
+        blob += value.encode("utf-8")
+        offsets.append(len(blob))
+
+    sections = [_u32_bytes(offsets), bytes(blob), _u32_bytes(nodes), _u32_bytes(file_refs)]
+    section_offsets = []
+    cursor = _DIR_INFO_HEADER.size
+    for section in sections:
+        cursor += -cursor % 8
+        section_offsets.append(cursor)
+        cursor += len(section)
+
+    header = _DIR_INFO_HEADER.pack(DIR_INFO_MAGIC, DIR_INFO_VERSION, source_size, source_digest,
+                                   len(strings), len(files), len(nodes) // 5, len(file_refs), *section_offsets, cursor)
+    tmp_file = out_file + ".tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(header)
+        for offset, section in zip(section_offsets, sections):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(section)
+    os.replace(tmp_file, out_file)
+    return len(nodes) // 5, len(files)
+
+class CompiledDirInfo:
+    def __init__(self, path):
+        if sys.byteorder != "little":
+            raise ValueError("compiled index requires a little-endian host")
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.source_size, self.source_digest, n_strings, n_files, n_nodes, n_refs,
+         strings_off, blob_off, nodes_off, refs_off, end) = _DIR_INFO_HEADER.unpack_from(self._map, 0)
+        if magic != DIR_INFO_MAGIC or version != DIR_INFO_VERSION or end != len(self._map):
+            raise ValueError("not a compiled dir_info index (or wrong version)")
+        view = memoryview(self._map)
+        self._offsets = view[strings_off:strings_off + 4 * (n_strings + 1)].cast("I")
+        self._blob = view[blob_off:nodes_off]
+        self._nodes = view[nodes_off:nodes_off + 20 * n_nodes].cast("I")
+        self._refs = view[refs_off:refs_off + 4 * n_refs].cast("I")
+        self._children = {}
+        self.file_array = CompiledStringTable(self, n_files)
+        self.dirs = CompiledDirNode(self, 0)
+
+    def string(self, index):
+        return bytes(self._blob[self._offsets[index]:self._offsets[index + 1]]).decode("utf-8")
+
+    def node(self, node_id):
+        base = node_id * 5
+        return self._nodes[base:base + 5]
+
+    def children(self, node_id):
+        # name -> node id, built on first access for the nodes actually visited
+        found = self._children.get(node_id)
+        if found is None:
+            _, first, count, _, _ = self.node(node_id)
+            found = {self.string(self._nodes[child * 5]): child for child in range(first, first + count)}
+            self._children[node_id] = found
+        return found
+
+    def files(self, node_id):
+        _, _, _, first, count = self.node(node_id)
+        return self._refs[first:first + count].tolist()
+
+class CompiledStringTable:
+    # Read-only stand-in for the json file_array list
+    def __init__(self, index, length):
+        self._index = index
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._length
+        if not 0 <= i < self._length:
+            raise IndexError("file_array index out of range")
+        return self._index.string(i)
+
+    def __iter__(self):
+        for i in range(self._length):
+            yield self._index.string(i)
+
+class CompiledDirNode:
+    # Read-only stand-in for a json directory node: node["directories"][name], node["files"]
+    def __init__(self, index, node_id):
+        self._index = index
+        self._node_id = node_id
+
+    def __getitem__(self, key):
+        if key == "directories":
+            return CompiledDirMap(self._index, self._node_id)
+        if key == "files":
+            return self._index.files(self._node_id)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in ("directories", "files")
+
+class CompiledDirMap:
+    def __init__(self, index, node_id):
+        self._index = index
+        self._node_id = node_id
+
+    def _children(self):
+        return self._index.children(self._node_id)
+
+    def __getitem__(self, name):
+        return CompiledDirNode(self._index, self._children()[name])
+
+    def __contains__(self, name):
+        return name in self._children()
+
+    def __iter__(self):
+        return iter(self._children())
+
+    def __len__(self):
+        return len(self._children())
+
+    def keys(self):
+        return self._children().keys()
+
+    def items(self):
+        for name, child in self._children().items():
+            yield name, CompiledDirNode(self._index, child)
@@ -0,0 +1,156 @@
+# Conflicts between the mods of a library: files and fighter slots provided by more than one mod.
+import os
+import re
+import concurrent.futures
+
+from cache import hash40
+from helpers import UniqueList, GetAssumedShareSlot
+from modindex import mod_index, _mod_indexes
+
+# --------------------------
+# Mod path classification
+# --------------------------
+_SLOT_NAME = re.compile(r"c\d{2,3}$")
+_SOUND_NAME = re.compile(r"(?:se|vc)_(.+?)_(c\d{2,3})")
+_EFFECT_SLOT = re.compile(r"ef_.+?_(c\d{2,3})")
+_UI_NAME = re.compile(r"chara_\d+_(.+)_(\d{2,3})\.bntx$")
+
+def classify_mod_path(path):
+    # -> (category, fighter, slot) for a mod-relative path; category is one of
+    # fighter, ui, sound, effect, transplant, camera or other
+    parts = path.split("/")
+    if path.startswith("ui/replace/chara/") or path.startswith("ui/replace_patch/chara/"):
+        m = _UI_NAME.search(parts[-1])
+        return ("ui", m.group(1), "c" + m.group(2)) if m else ("ui", None, None)
+    if path.startswith("sound/bank/fighter/") or path.startswith("sound/bank/fighter_voice/"):
+        m = _SOUND_NAME.match(parts[3] if len(parts) > 3 else "")
+        return ("sound", m.group(1), m.group(2)) if m else ("sound", None, None)
+    if len(parts) < 3:
+        return ("other", None, None)
+    if path.startswith("effect/fighter/"):
+        if len(parts) > 3 and parts[3] == "transplant":
+            return ("transplant", parts[2], None)
+        m = _EFFECT_SLOT.search(parts[-1])
+        return ("effect", parts[2], m.group(1) if m else None)
+    if path.startswith("camera/fighter/"):
+        slot = next((p for p in parts[3:-1] if _SLOT_NAME.match(p)), None)
+        return ("camera", parts[2], slot)
+    if path.startswith("fighter/"):
+        slot = next((p for p in parts[2:-1] if _SLOT_NAME.match(p)), None)
+        return ("fighter", parts[1], slot)
+    return ("other", None, None)
+
+# --------------------------
+# Library
+# --------------------------
+def library_mods(library, include_disabled=True):
+    # mod folders of a library in name order (dot-prefixed folders are disabled mods)
+    with os.scandir(library) as it:
+        return sorted(entry.path for entry in it if entry.is_dir() and not entry.name.startswith(".reslot-")
+                      and (include_disabled or not entry.name.startswith(".")))
+
+# --------------------------
+# Library conflict engine
+# --------------------------
+# One inverted index game path (hash40 of the lowercased path) -> mods providing it, filled in a
+# single pass over every mod's files; conflicts are the entries with more than one provider.
+CONFLICT_IGNORED_FILES = {"desktop.ini"}
+_CONFLICT_IGNORED_NAME = re.compile(r"^readme\.", re.IGNORECASE)
+MAX_SLOT = 255
+# ui file names use these instead of the fighter folder name (see plan_rename_ui)
+UI_FIGHTER_NAMES = {"ice_climber": "popo", "eflame_first": "eflame", "eflame_only": "eflame",
+                    "elight_first": "elight", "elight_only": "elight"}
+
+def classify_library_path(path):
+    category, fighter, slot = classify_mod_path(path)
+    if category == "ui":
+        fighter = UI_FIGHTER_NAMES.get(fighter, fighter)
+    return category, fighter, slot
+
+class ConflictIndex:
+    def __init__(self):
+        self.providers = {}
+        self.paths = {}
+        # fighter -> slot -> mods using it
+        self.slots = {}
+
+    def add_mod(self, name, files):
+        for file in files:
+            path = file.lower()
+            filename = path.rsplit("/", 1)[-1]
+            if "." not in filename or filename in CONFLICT_IGNORED_FILES or _CONFLICT_IGNORED_NAME.match(filename):
+                continue
+            key = hash40(path)
+            if key in self.providers:
+                self.providers[key].append(name)
+            else:
+                self.providers[key] = [name]
+                self.paths[key] = path
+            _, fighter, slot = classify_library_path(path)
+            if fighter and slot:
+                self.slots.setdefault(fighter, {}).setdefault(slot, UniqueList()).add(name)
+
+    def conflicts(self):
+        # [(hash40, path, category, fighter, slot, mods)] in path order
+        found = []
+        for key, mods in self.providers.items():
+            if len(mods) > 1:
+                path = self.paths[key]
+                category, fighter, slot = classify_library_path(path)
+                found.append((key, path, category, fighter, slot, mods))
+        return sorted(found, key=lambda c: c[1])
+
+    def slot_conflicts(self, conflicts):
+        # (fighter, slot) -> {"mods": [...], "files": n} for the conflicts that belong to a fighter slot
+        slots = {}
+        for _, _, _, fighter, slot, mods in conflicts:
+            if fighter and slot:
+                entry = slots.setdefault((fighter, slot), {"mods": UniqueList(), "files": 0})
+                entry["files"] += 1
+                for mod in mods:
+                    entry["mods"].add(mod)
+        return slots
+
+    def suggest(self, slot_conflicts):
+        # The first mod (load order is by name) keeps the slot; every other one is offered the next
+        # added slot nobody uses, sharing the vanilla slot GetAssumedShareSlot picks.
+        suggestions = []
+        taken = {fighter: set(slots) for fighter, slots in self.slots.items()}
+        for (fighter, slot), entry in sorted(slot_conflicts.items()):
+            for mod in sorted(entry["mods"])[1:]:
+                free = next((f"c{n:02d}" for n in range(8, MAX_SLOT + 1) if f"c{n:02d}" not in taken[fighter]), None)
+                if free is None:
+                    continue
+                taken[fighter].add(free)
+                share = "c0" + str(GetAssumedShareSlot(int(slot.strip("c")) % 8, fighter))
+                suggestions.append({"mod": mod, "fighter": fighter, "source": slot, "target": free, "share": share})
+        return suggestions
+
+def find_library_conflicts(library, include_disabled=False, threads=None):
+    library = os.path.abspath(library)
+    mod_dirs = library_mods(library, include_disabled)
+
+    def files_of(mod_dir):
+        try:
+            return mod_index(mod_dir).files
+        except OSError:
+            return []
+        finally:
+            _mod_indexes.pop(mod_dir, None)
+
+    index = ConflictIndex()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as pool:
+        for mod_dir, files in zip(mod_dirs, pool.map(files_of, mod_dirs)):
+            index.add_mod(os.path.basename(mod_dir), files)
+    conflicts = index.conflicts()
+    slots = index.slot_conflicts(conflicts)
+    return {
+        "library": library,
+        "mods": len(mod_dirs),
+        "files": sum(len(mods) for mods in index.providers.values()),
+        "conflicts": [{"path": path, "hash40": "0x%010x" % key, "category": category, "fighter": fighter, "slot": slot, "mods": mods}
+                      for key, path, category, fighter, slot, mods in conflicts],
+        "slots": [{"fighter": fighter, "slot": slot, "mods": entry["mods"], "files": entry["files"]}
+                  for (fighter, slot), entry in sorted(slots.items())],
+        "suggestions": index.suggest(slots),
+    }
@@ -0,0 +1,258 @@
+# Progress events, profiling and the run's counters and timings, shared by every stage of a run.
+import os
+import sys
+import json
+import time
+import contextlib
+import threading
+
+from cache import cache_root
+
+# --------------------------
+# Timings (--timings)
+# --------------------------
+# Startup/load times in ms by name, shown with --timings
+TIMINGS = {}
+
+def record_timing(name, started):
+    TIMINGS[name] = TIMINGS.get(name, 0.0) + (time.perf_counter() - started) * 1000
+
+# --------------------------
+# Progress events (--events ndjson)
+# --------------------------
+# Every stage of a run (index, scan, plan, copy, config, prcxml, rename) reports
+#   {"event": "stage", "stage": "copy", "status": "start"}
+#   {"event": "progress", "stage": "copy", "files": 120, "total": 900, "bytes": 10485760}
+#   {"event": "stage", "stage": "copy", "status": "end", "elapsed_ms": 812.4, "files": 900, "bytes": ...}
+# to the installed sink; nothing is done while no sink is installed. The game indexes load on first
+# use, so their index stage (with "resource": "known-files" / "dir-info") runs inside the stage that
+# needs them, usually plan; runs that never need them report none.
+EVENT_FORMATS = ("ndjson",)
+PROGRESS_INTERVAL = 0.25  # seconds between progress events of a stage
+_event_sink = None
+
+def emit_event(event, **fields):
+    if _event_sink is not None:
+        _event_sink({"event": event, **fields})
+
+@contextlib.contextmanager
+def event_sink(sink):
+    global _event_sink
+    previous, _event_sink = _event_sink, sink
+    try:
+        yield
+    finally:
+        _event_sink = previous
+
+def ndjson_sink(stream):
+    # One JSON object per line, flushed right away so a reader sees progress as it happens
+    lock = threading.Lock()
+    def sink(event):
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        with lock:
+            stream.write(line)
+            stream.flush()
+    return sink
+
+@contextlib.contextmanager
+def event_stage(stage):
+    # Yields a dict; the counts put there are reported with the stage's end event
+    counts = {}
+    if _event_sink is None and _run_profile is None:
+        yield counts
+        return
+    emit_event("stage", stage=stage, status="start")
+    started = time.perf_counter()
+    status = "failed"
+    try:
+        if _run_profile is not None:
+            with _run_profile.stage(stage, counts):
+                yield counts
+        else:
+            yield counts
+        status = "end"
+    finally:
+        emit_event("stage", stage=stage, status=status, elapsed_ms=round((time.perf_counter() - started) * 1000, 1), **counts)
+
+class EventProgress:
+    # Thread-safe file/byte counter that emits at most one progress event per PROGRESS_INTERVAL
+    def __init__(self, stage, total):
+        self.stage = stage
+        self.total = total
+        self.files = 0
+        self.bytes = 0
+        self.last = 0.0
+        self.lock = threading.Lock()
+
+    def step(self, size=0):
+        with self.lock:
+            self.files += 1
+            self.bytes += size
+            now = time.perf_counter()
+            if now - self.last < PROGRESS_INTERVAL and self.files < self.total:
+                return
+            self.last = now
+            emit_event("progress", stage=self.stage, files=self.files, total=self.total, bytes=self.bytes)
+
+# --------------------------
+# Profiling (--profile / --trace-memory)
+# --------------------------
+# --profile runs every stage (see event_stage) under cProfile and dumps one reslot_profile.<stage>.prof
+# per stage; --trace-memory records each stage's tracemalloc peak and top allocation sites.
+# Both write reslot_profile.json, with the stage times and counts and the run's COUNTERS, to --profile-out,
+# or the reslot-profile folder of the cache dir (the temp folder without one); never into the mod or output
+# folder, whose contents get installed with the mod. Legacy mode, which has no flags, reads
+# RESLOT_PROFILE=1 / RESLOT_TRACE_MEMORY=1 / RESLOT_PROFILE_OUT. Worker processes (--jobs) report counters,
+# not profiles.
+PROFILE_SUMMARY_FILE = "reslot_profile.json"
+PROFILE_DIR_NAME = "reslot-profile"
+PROFILE_ENV = "RESLOT_PROFILE"
+TRACE_MEMORY_ENV = "RESLOT_TRACE_MEMORY"
+PROFILE_OUT_ENV = "RESLOT_PROFILE_OUT"
+PROFILE_TOP = 15  # functions / allocation sites listed per stage
+_run_profile = None
+
+# Work done by the current run: files_scanned, files_copied, bytes_copied, config_entries_added,
+# counted per call in every run, and, while profiling, the membership checks of addSharedFiles /
+# add_missing_files: every lookup in a UniqueList, ExistingFiles or known_files made inside them.
+COUNTERS = {}
+_count_membership = False
+_membership_counter = None  # counter the lookups go to; None outside counted_membership()
+
+def count(name, n=1):
+    COUNTERS[name] = COUNTERS.get(name, 0) + n
+
+@contextlib.contextmanager
+def counted_membership(name):
+    # also a decorator: counts the lookups of the decorated function when profiling
+    global _membership_counter
+    if not _count_membership:
+        yield
+        return
+    previous, _membership_counter = _membership_counter, name
+    try:
+        yield
+    finally:
+        _membership_counter = previous
+
+def env_flag(name):
+    return os.environ.get(name, "").strip().lower() in ("1", "true", "yes", "on")
+
+class RunProfile:
+    def __init__(self, cpu, memory, out_dir):
+        self.cpu = cpu
+        self.memory = memory
+        # where the summary goes; None: the cache dir's profile folder, resolved on save
+        self.out_dir = out_dir
+        self.stages = {}
+        self.profilers = {}
+        self.active = False
+        self.started = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name, counts):
+        entry = self.stages.setdefault(name, {"runs": 0, "elapsed_ms": 0.0})
+        # a stage inside another one is part of the outer stage's profile
+        outer = not self.active
+        profiler = None
+        if outer and self.cpu:
+            import cProfile
+            profiler = self.profilers.setdefault(name, cProfile.Profile())
+        if outer and self.memory:
+            import tracemalloc
+            tracemalloc.reset_peak()
+        self.active = True
+        started = time.perf_counter()
+        try:
+            if profiler is not None:
+                profiler.enable()
+            try:
+                yield
+            finally:
+                if profiler is not None:
+                    profiler.disable()
+        finally:
+            if outer:
+                self.active = False
+            entry["runs"] += 1
+            entry["elapsed_ms"] = round(entry["elapsed_ms"] + (time.perf_counter() - started) * 1000, 1)
+            for key, value in counts.items():
+                totals = entry.setdefault("counts", {})
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    totals[key] = value
+                else:
+                    totals[key] = totals.get(key, 0) + value
+            if outer and self.memory:
+                self._record_memory(entry)
+
+    def _record_memory(self, entry):
+        import tracemalloc
+        peak = tracemalloc.get_traced_memory()[1]
+        if peak < entry.get("peak_bytes", 0):
+            return
+        entry["peak_bytes"] = peak
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        entry["top_allocations"] = [{"where": f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                                     "bytes": stat.size, "count": stat.count}
+                                    for stat in snapshot.statistics("lineno")[:PROFILE_TOP]]
+
+    def summary(self):
+        summary = {"elapsed_ms": round((time.perf_counter() - self.started) * 1000, 1),
+                   "profile": self.cpu, "trace_memory": self.memory,
+                   "stages": self.stages, "counters": dict(COUNTERS), "timings_ms": {k: round(v, 1) for k, v in TIMINGS.items()}}
+        if self.memory:
+            summary["peak_bytes"] = max([entry.get("peak_bytes", 0) for entry in self.stages.values()], default=0)
+        return summary
+
+    def save(self):
+        out_dir = self.out_dir or os.environ.get(PROFILE_OUT_ENV) or os.path.join(cache_root(), PROFILE_DIR_NAME)
+        os.makedirs(out_dir, exist_ok=True)
+        if self.cpu:
+            import pstats
+            for name, profiler in self.profilers.items():
+                dump = os.path.join(out_dir, f"reslot_profile.{name}.prof")
+                profiler.dump_stats(dump)
+                stats = pstats.Stats(profiler).stats
+                top = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:PROFILE_TOP]
+                self.stages[name].update(profile_file=os.path.basename(dump), top_functions=[
+                    {"function": f"{os.path.basename(file)}:{line}({func})", "calls": calls,
+                     "self_ms": round(own * 1000, 2), "cumulative_ms": round(cumulative * 1000, 2)}
+                    for (file, line, func), (_, calls, own, cumulative, _) in top])
+        path = os.path.join(out_dir, PROFILE_SUMMARY_FILE)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=4)
+        return path
+
+@contextlib.contextmanager
+def profile_run(cpu, memory, out_dir):
+    # Profile everything run inside; the summary is written on the way out, also when the run failed
+    global _run_profile, _count_membership
+    if not (cpu or memory):
+        yield None
+        return
+    import tracemalloc
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    COUNTERS.clear()
+    previous, _run_profile = _run_profile, RunProfile(cpu, memory, out_dir)
+    counting, _count_membership = _count_membership, True
+    profile = _run_profile
+    try:
+        yield profile
+    finally:
+        _run_profile, _count_membership = previous, counting
+        try:
+            # stderr: with --events, stdout carries only the events
+            print("Profile written to", profile.save(), file=sys.stderr)
+        except OSError as e:
+            print(f"Warning: could not write the profile summary: {e}", file=sys.stderr)
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+
+def cli_profile(args):
+    # profile_run() for a parsed subcommand (flags, or the environment variables)
+    return profile_run(getattr(args, "profile", False) or env_flag(PROFILE_ENV),
+                       getattr(args, "trace_memory", False) or env_flag(TRACE_MEMORY_ENV),
+                       getattr(args, "profile_out", None))
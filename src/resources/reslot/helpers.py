@@ -0,0 +1,156 @@
+# Helpers shared by the reslotter modules: path normalization, the list types config.json
+# sections are built on, and the share slot rules of the original GUI.
+import os
+
+import events
+
+# --------------------------
+# Shared helpers (from no-GUI)
+# --------------------------
+def fix_windows_path(path: str, to_linux: bool):
+    if to_linux:
+        return path.replace("\\", "/")
+    else:
+        return path.replace("/", os.sep)
+
+# Insertion-ordered list with O(1) membership; json.dump writes it as a plain list.
+# Every list operation that adds or drops items keeps the member set in sync.
+class UniqueList(list):
+    def __init__(self, items=()):
+        super().__init__(items)
+        self._rebuild()
+
+    def __contains__(self, item):
+        if events._membership_counter is not None:
+            events.count(events._membership_counter)
+        return item in self._members
+
+    def _added(self, item):
+        self._members.add(item)
+
+    def _rebuild(self):
+        # after items were removed or replaced (rare): recompute from the list
+        self._members = set(list.__iter__(self))
+
+    def append(self, item):
+        super().append(item)
+        self._added(item)
+
+    def extend(self, items):
+        for item in items:
+            self.append(item)
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def insert(self, index, item):
+        super().insert(index, item)
+        self._added(item)
+
+    def add(self, item):
+        # append only if not already present
+        if events._membership_counter is not None:
+            events.count(events._membership_counter)
+        if item not in self._members:
+            self.append(item)
+
+    def remove(self, item):
+        super().remove(item)
+        self._rebuild()
+
+    def pop(self, index=-1):
+        item = super().pop(index)
+        self._rebuild()
+        return item
+
+    def clear(self):
+        super().clear()
+        self._rebuild()
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._rebuild()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._rebuild()
+
+    def __imul__(self, n):
+        super().__imul__(n)
+        self._rebuild()
+        return self
+
+class ExistingFiles(UniqueList):
+    # The mod's file list plus an index of the directories that contain files,
+    # so "is dir_name a substring of any existing file" does not scan the whole list.
+    # A cached miss remembers how many files it was checked against; later appends are
+    # checked when the same text is asked again, so appending never touches the cache.
+    def _rebuild(self):
+        super()._rebuild()
+        self._dirs = set()
+        self._substring_hits = set()
+        self._substring_misses = {}
+        for item in list.__iter__(self):
+            self._index_dirs(item)
+
+    def _index_dirs(self, path):
+        end = path.rfind("/")
+        while end > 0:
+            parent = path[:end]
+            if parent in self._dirs:
+                break
+            self._dirs.add(parent)
+            end = path.rfind("/", 0, end)
+
+    def _added(self, item):
+        super()._added(item)
+        self._index_dirs(item)
+
+    def insert(self, index, item):
+        super().insert(index, item)
+        # misses only hold for the files before the count they remember
+        self._substring_misses.clear()
+
+    def contains_substring(self, text):
+        # same answer as any(text in f for f in self), answered from the directory index when possible
+        if events._membership_counter is not None:
+            events.count(events._membership_counter)
+        if text in self._dirs or text in self._substring_hits:
+            return True
+        checked = self._substring_misses.get(text, 0)
+        if any(text in f for f in self[checked:]):
+            self._substring_misses.pop(text, None)
+            self._substring_hits.add(text)
+            return True
+        self._substring_misses[text] = len(self)
+        return False
+
+# --------------------------
+# Share slot rules (from withgui.py)
+# --------------------------
+# Vanilla alts that have their own models, per fighter (see GetAssumedShareSlot)
+ALTS_LAST2 = frozenset(["edge","szerosuit","littlemac","mario","metaknight","jack"])
+ALTS_ODD = frozenset(["bayonetta","master","cloud","kamui","ike","shizue","demon",
+    "link","packun","reflet","wario","wiifit",
+    "ptrainer","ptrainer_low","pfushigisou","plizardon","pzenigame"])
+ALTS_ALL = frozenset(["koopajr","murabito","purin","pikachu","pichu","sonic"])
+ASSUMED_SHARE_SLOT = {
+    "brave": lambda source: source % 4,
+    "trail": lambda source: source % 4,
+    "pikmin": lambda source: 0 if (source<4) else 4,
+    "popo": lambda source: 0 if (source<4) else 4,
+    "nana": lambda source: 0 if (source<4) else 4,
+    "pacman": lambda source: 0 if (source==0 or source==7) else source,
+    "ridley": lambda source: 0 if (source==1 or source==7) else source,
+    "inkling": lambda source: source%2 if source<6 else source,
+    "pickel": lambda source: source%2 if source<6 else source,
+    "shulk": lambda source: 0 if source<7 else 7,
+    **{fighter: (lambda source: 0 if source<6 else source) for fighter in ALTS_LAST2},
+    **{fighter: (lambda source: source) for fighter in ALTS_ALL},
+    **{fighter: (lambda source: source % 2) for fighter in ALTS_ODD},
+}
+
+def GetAssumedShareSlot(source, fighter):
+    rule = ASSUMED_SHARE_SLOT.get(fighter)
+    return rule(source) if rule else 0
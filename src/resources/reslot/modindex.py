@@ -0,0 +1,168 @@
+# Directory index of a mod folder (or of an archive's entry list), walked once per run.
+import os
+import json
+import time
+import hashlib
+
+import cache
+from cache import cache_root, MOD_INDEX_RACY_NS
+from events import count
+from helpers import fix_windows_path
+
+# --------------------------
+# Mod index (one os.scandir walk of the mod folder, shared by every scan helper)
+# --------------------------
+# Reslots always walk the folder. Read-only scans (scan --mod-dir) with --cache-dir keep the index in
+# the cache folder and reuse it while none of the mod's directories changed mtime (adding, removing or
+# renaming a file updates the mtime of its directory). A directory whose mtime is within
+# MOD_INDEX_RACY_NS of the scan is never trusted: FAT/exFAT (SD cards) keep mtimes to 2 seconds, so a
+# change made right after the scan could leave it unchanged.
+MOD_INDEX_VERSION = 2
+_mod_indexes = {}
+_mod_index_sidecar = False
+
+class ModIndex:
+    def __init__(self, root, tree, sizes, scanned_ns=None):
+        self.root = root
+        # relative dir ("" is the root) -> (mtime_ns, [subdir names], [file names]), in directory order
+        self.tree = tree
+        self.sizes = sizes
+        # time.time_ns() when the walk started
+        self.scanned_ns = scanned_ns
+
+    @classmethod
+    def scan(cls, root):
+        tree = {}
+        sizes = {}
+        pending = [""]
+        scanned_ns = time.time_ns()
+        while pending:
+            rel = pending.pop()
+            path = os.path.join(root, fix_windows_path(rel, False)) if rel else root
+            subdirs, files = [], []
+            # mtime before listing: a file added while listing changes it again, so the index is rescanned
+            mtime_ns = os.stat(path).st_mtime_ns
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        subdirs.append(entry.name)
+                    else:
+                        files.append(entry.name)
+                        sizes[f"{rel}/{entry.name}" if rel else entry.name] = entry.stat().st_size
+            tree[rel] = (mtime_ns, subdirs, files)
+            pending += [f"{rel}/{name}" if rel else name for name in subdirs]
+        return cls(root, tree, sizes, scanned_ns)
+
+    @classmethod
+    def from_files(cls, root, files, sizes=None):
+        # index of a file list that is not on disk (archives); never invalidated
+        tree = {"": (None, [], [])}
+        for file in files:
+            parts = file.split("/")
+            for i in range(len(parts) - 1):
+                parent, rel = "/".join(parts[:i]), "/".join(parts[:i + 1])
+                if rel not in tree:
+                    tree[rel] = (None, [], [])
+                    tree[parent][1].append(parts[i])
+            tree["/".join(parts[:-1])][2].append(parts[-1])
+        return cls(root, tree, dict(sizes or {}))
+
+    @staticmethod
+    def sidecar(root):
+        return os.path.join(cache_root(), "reslot-mod-%s.json" % hashlib.blake2b(
+            root.encode("utf-8"), digest_size=8).hexdigest())
+
+    @classmethod
+    def load(cls, root):
+        root = os.path.abspath(root)
+        try:
+            with open(cls.sidecar(root), "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached["version"] == MOD_INDEX_VERSION and cached["root"] == root:
+                index = cls(root, {rel: tuple(node) for rel, node in cached["tree"].items()}, cached["sizes"], cached["scanned_ns"])
+                if index.is_current():
+                    return index
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        index = cls.scan(root)
+        index.save()
+        return index
+
+    def is_racy(self):
+        # a directory changed so close to the scan that a later change may not move its mtime
+        return self.scanned_ns is None or any(mtime_ns is None or mtime_ns >= self.scanned_ns - MOD_INDEX_RACY_NS
+                                              for mtime_ns, _, _ in self.tree.values())
+
+    def is_current(self):
+        if self.is_racy():
+            return False
+        for rel, (mtime_ns, _, _) in self.tree.items():
+            try:
+                if os.stat(os.path.join(self.root, fix_windows_path(rel, False))).st_mtime_ns != mtime_ns:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def save(self):
+        if self.is_racy():
+            return
+        path = self.sidecar(self.root)
+        try:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"version": MOD_INDEX_VERSION, "root": self.root, "tree": self.tree, "sizes": self.sizes,
+                           "scanned_ns": self.scanned_ns}, f, ensure_ascii=False)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            pass
+
+    def isdir(self, rel=""):
+        return rel in self.tree
+
+    def subdirs(self, rel=""):
+        node = self.tree.get(rel)
+        return list(node[1]) if node else []
+
+    def walk(self, rel=""):
+        # (relative dir, [subdir names], [file names]) top-down, in os.walk order
+        if rel not in self.tree:
+            return
+        _, subdirs, files = self.tree[rel]
+        yield rel, subdirs, files
+        for name in subdirs:
+            yield from self.walk(f"{rel}/{name}" if rel else name)
+
+    @property
+    def files(self):
+        # same order as find_fighter_files: files below the top-level folders, top-down
+        found = []
+        for top in self.subdirs():
+            for rel, _, files in self.walk(top):
+                found += [f"{rel}/{name}" for name in files]
+        return found
+
+def mod_index(mod_directory):
+    # The index of a mod folder, loaded once per run (see reset_mod_indexes)
+    root = os.path.abspath(mod_directory)
+    index = _mod_indexes.get(root)
+    if index is None:
+        index = _mod_indexes[root] = ModIndex.load(root) if _mod_index_sidecar and cache.CACHE_DIR else ModIndex.scan(root)
+        count("files_scanned", len(index.sizes))
+    return index
+
+def reset_mod_indexes(sidecar=False):
+    # called when a new command starts; a long-lived process must see changes made in between.
+    # sidecar: the command only reads the mod, so a cached index (--cache-dir) may be reused
+    global _mod_index_sidecar
+    _mod_indexes.clear()
+    _mod_index_sidecar = sidecar
+
+def _locate(path):
+    # (index, relative dir) for a folder of an indexed mod, indexing the folder itself otherwise
+    path = os.path.abspath(path)
+    for root, index in list(_mod_indexes.items()):
+        if path == root:
+            return index, ""
+        if path.startswith(root + os.sep):
+            return index, fix_windows_path(os.path.relpath(path, root), True)
+    return mod_index(path), ""
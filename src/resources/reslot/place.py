@@ -0,0 +1,428 @@
+# Placing planned files on disk: batched copies/links, the incremental cache, deduplication and
+# the journaled in-place transaction.
+import os
+import json
+import shutil
+import hashlib
+import concurrent.futures
+
+import events
+from events import event_stage, EventProgress, count
+from helpers import fix_windows_path, UniqueList
+
+# --------------------------
+# Materialization (placing planned files on disk)
+# --------------------------
+LINK_MODES = ("copy", "hardlink", "reflink")
+FICLONE = 0x40049409  # linux/fs.h, clone a whole file on btrfs/xfs
+
+# Settings for the materialize stage (set from the CLI)
+link_mode = "copy"
+io_threads = None
+
+def _reflink(src, dst):
+    import fcntl
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+
+def _copy_file(src, dst):
+    # copy_file_range lets the kernel copy (or share extents) without a round trip through Python
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+                if remaining == 0:
+                    return
+        except OSError:
+            pass
+    shutil.copyfile(src, dst)
+
+def place_file(src, dst, mode="copy"):
+    # -> method actually used; any existing destination is replaced, never written through
+    if os.path.lexists(dst):
+        if os.path.exists(dst) and os.path.samefile(src, dst):
+            return "skipped"
+        os.unlink(dst)
+    if mode == "hardlink":
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            pass
+    elif mode == "reflink":
+        try:
+            _reflink(src, dst)
+            return "reflink"
+        except (OSError, ImportError):
+            if os.path.exists(dst):
+                os.unlink(dst)
+    _copy_file(src, dst)
+    shutil.copymode(src, dst)
+    return "copy"
+
+def materialize(copies, mode=None, threads=None, cache=None, links=()):
+    # copies: [(src, dst)] in plan order. Directories are created once up front, then files are
+    # placed on a thread pool. Later entries for the same destination win, as with sequential copies.
+    # With a ReslotCache, outputs whose source is unchanged since the last run are left alone.
+    # links: [(placed dst, dst)] duplicates (see dedupe_copies), hardlinked once copies are placed.
+    with event_stage("copy") as counts:
+        stats = _materialize(copies, mode or link_mode, threads, cache, links)
+        counts.update(files=stats["files"], bytes=stats["bytes"], skipped=stats["skipped"])
+    count("files_copied", stats["copy"] + stats["hardlink"] + stats["reflink"])
+    count("bytes_copied", stats["bytes"])
+    return stats
+
+def _materialize(copies, mode, threads, cache, links):
+    latest = {}
+    for src, dst in copies:
+        latest.pop(dst, None)
+        latest[dst] = src
+    jobs = [(src, dst) for dst, src in latest.items()]
+
+    stats = {"files": len(jobs) + len(links), "bytes": 0, "copy": 0, "hardlink": 0, "reflink": 0, "skipped": 0, "removed": 0}
+    place = lambda job, mode=mode: place_file(job[0], job[1], mode)
+    if events._event_sink is not None:
+        progress = EventProgress("copy", len(jobs) + len(links))
+        def place(job, mode=mode):
+            method = place_file(job[0], job[1], mode)
+            progress.step(os.path.getsize(job[0]))
+            return method
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads or io_threads) as pool:
+        if cache is not None:
+            stats["removed"] = cache.remove_stale(latest)
+            current = list(pool.map(lambda job: cache.is_current(job[0], job[1]), jobs))
+            stats["skipped"] = current.count(True)
+            jobs = [job for job, unchanged in zip(jobs, current) if not unchanged]
+            if events._event_sink is not None:
+                progress.total = len(jobs) + len(links)
+
+        for dir_name in sorted({os.path.dirname(dst) for _, dst in jobs + list(links)}):
+            os.makedirs(dir_name, exist_ok=True)
+
+        if any(src in latest for src, _ in jobs):
+            # a source is also a destination: keep the original order
+            methods = [place(job) for job in jobs]
+        else:
+            methods = list(pool.map(place, jobs))
+        if cache is not None:
+            list(pool.map(lambda job: cache.record(job[0], job[1]), jobs))
+            cache.save()
+        # the primaries are in place now
+        methods += list(pool.map(lambda job: place(job, "hardlink"), links))
+    for (src, _), method in zip(jobs + list(links), methods):
+        stats[method] += 1
+        stats["bytes"] += os.path.getsize(src)
+    return stats
+
+# --------------------------
+# Incremental reslot cache
+# --------------------------
+RESLOT_CACHE_FILE = ".reslot-cache.json"
+FINGERPRINTS = ("stat", "blake2", "xxhash")
+
+def file_digest(path, kind="blake2"):
+    digest = None
+    if kind == "xxhash":
+        try:
+            import xxhash
+            digest = xxhash.xxh3_128()
+        except ImportError:
+            pass
+    if digest is None:
+        digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ReslotCache:
+    # Lives next to config.json in the output folder and remembers, for every file the last run
+    # placed, which source it came from and the source/output fingerprints at that time.
+    def __init__(self, target_dir, fingerprint="stat"):
+        self.target_dir = target_dir
+        self.path = os.path.join(target_dir, RESLOT_CACHE_FILE)
+        self.fingerprint = fingerprint
+        self.files = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("version") == 1 and cached.get("fingerprint") == fingerprint:
+                self.files = cached["files"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def _key(self, dst):
+        return fix_windows_path(os.path.relpath(dst, self.target_dir), True)
+
+    def is_current(self, src, dst):
+        entry = self.files.get(self._key(dst))
+        if entry is None or entry["src"] != src:
+            return False
+        try:
+            src_stat = os.stat(src)
+            dst_stat = os.stat(dst)
+        except OSError:
+            return False
+        if (dst_stat.st_size, dst_stat.st_mtime_ns) != (entry["dst_size"], entry["dst_mtime_ns"]):
+            return False
+        if (src_stat.st_size, src_stat.st_mtime_ns) == (entry["size"], entry["mtime_ns"]):
+            return True
+        # touched but possibly identical: compare content when digests are kept
+        if self.fingerprint != "stat" and src_stat.st_size == entry["size"] and file_digest(src, self.fingerprint) == entry.get("digest"):
+            entry["mtime_ns"] = src_stat.st_mtime_ns
+            return True
+        return False
+
+    def record(self, src, dst):
+        src_stat = os.stat(src)
+        dst_stat = os.stat(dst)
+        entry = {"src": src, "size": src_stat.st_size, "mtime_ns": src_stat.st_mtime_ns,
+                 "dst_size": dst_stat.st_size, "dst_mtime_ns": dst_stat.st_mtime_ns}
+        if self.fingerprint != "stat":
+            entry["digest"] = file_digest(src, self.fingerprint)
+        self.files[self._key(dst)] = entry
+
+    def remove_stale(self, planned):
+        # delete outputs of the previous plan that the new plan no longer produces
+        keep = {self._key(dst) for dst in planned}
+        removed = 0
+        for key in [k for k in self.files if k not in keep]:
+            path = os.path.join(self.target_dir, fix_windows_path(key, False))
+            if os.path.isfile(path):
+                os.remove(path)
+                removed += 1
+            del self.files[key]
+        return removed
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "fingerprint": self.fingerprint, "files": self.files}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+# --------------------------
+# Deduplication (identical outputs written once)
+# --------------------------
+DEDUP_MODES = ("off", "hardlink", "share")
+
+def find_duplicate_copies(copies, threads=None):
+    # Groups of planned destinations that would receive identical bytes, in plan order.
+    # Only sources whose size collides with another one are hashed.
+    latest = {}
+    for src, dst in copies:
+        latest.pop(dst, None)
+        latest[dst] = src
+    by_size = {}
+    for dst, src in latest.items():
+        by_size.setdefault(os.path.getsize(src), []).append((src, dst))
+    candidates = [group for group in by_size.values() if len(group) > 1]
+    sources = sorted({src for group in candidates for src, _ in group})
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads or io_threads) as pool:
+        digests = dict(zip(sources, pool.map(file_digest, sources)))
+    groups = {}
+    for group in candidates:
+        for src, dst in group:
+            groups.setdefault((os.path.getsize(src), digests[src]), []).append(dst)
+    return [dsts for dsts in groups.values() if len(dsts) > 1]
+
+def share_duplicates(groups, target_dir, config, outputs, known_files):
+    # Express duplicates that are added files as shares of a vanilla path, with the same rules
+    # addSharedFiles uses: the shared path must be one the mod does not replace, or the game may
+    # load its vanilla data instead of the mod's bytes. `outputs` holds every path the run writes
+    # (relative to target_dir), so a group whose vanilla paths are all written, which is every group
+    # of a plain reslot, has no safe source and is hardlinked instead, as are groups without a
+    # vanilla path (runs that only write added slots). Returns the destinations that no longer need a file.
+    shared = set()
+    never_share_extensions = ['.nutexb']
+    for dsts in groups:
+        rels = [fix_windows_path(os.path.relpath(dst, target_dir), True) for dst in dsts]
+        vanilla = [rel for rel in rels if rel in known_files and rel not in outputs and not rel.startswith("ui/")]
+        if not vanilla:
+            continue
+        file_path = vanilla[0]
+        share_to = "share-to-vanilla"
+        if "motion/" in file_path or "camera/" in file_path:
+            share_to = "share-to-added"
+        elif "sound/bank/fighter" in file_path:
+            share_to = "share-to-added"
+        for dst, new_file_path in zip(dsts, rels):
+            if new_file_path in known_files or new_file_path.startswith("ui/"):
+                continue
+            if os.path.splitext(new_file_path)[1].lower() in never_share_extensions:
+                continue
+            if file_path not in config[share_to]:
+                config[share_to][file_path] = UniqueList()
+            config[share_to][file_path].add(new_file_path)
+            shared.add(dst)
+    return shared
+
+def dedupe_copies(copies, mode, target_dir, config, known_files, threads=None, link=True):
+    # Drop duplicate outputs from copies (in place); returns [(primary dst, dst)] for materialize() to
+    # hardlink once the primaries are placed (empty when link is False, e.g. for zip output).
+    # share mode adds the shares to config, checking vanilla paths against known_files.
+    groups = find_duplicate_copies(copies, threads)
+    shared = set()
+    if mode == "share":
+        outputs = {fix_windows_path(os.path.relpath(dst, target_dir), True) for _, dst in copies}
+        shared = share_duplicates(groups, target_dir, config, outputs, known_files)
+    links = []
+    if link:
+        for dsts in groups:
+            kept = [dst for dst in dsts if dst not in shared]
+            links += [(kept[0], dst) for dst in kept[1:]]
+    dropped = shared | {dst for _, dst in links}
+    copies[:] = [(src, dst) for src, dst in copies if dst not in dropped]
+    print(f"Deduplicated {len(dropped)} files: {len(shared)} shared in config.json, {len(links)} hardlinked")
+    return links
+
+def placement_summary(stats):
+    summary = (f"Placed {stats['files']} files ({stats['bytes']} bytes): {stats.get('moved', 0)} moved, "
+               f"{stats['copy']} copied, {stats['hardlink']} hardlinked, {stats['reflink']} reflinked, {stats['skipped']} unchanged")
+    if stats.get("removed"):
+        summary += f", {stats['removed']} stale removed"
+    return summary
+
+class InPlaceTransaction:
+    # Reslots a mod inside its own folder instead of building "<mod> (Temp)" and swapping folders.
+    # Planned sources are moved into a staging folder, the rest of the old top-level content is moved
+    # into a trash folder, and staged files are then renamed to their new paths. Each step is recorded
+    # in a journal so an interrupted run can be resumed or rolled back (see the recover command);
+    # the trash is only deleted on commit.
+    JOURNAL = ".reslot-journal.json"
+    STAGING = ".reslot-staging"
+    TRASH = ".reslot-trash"
+    KEEP = ("info.toml", "preview.webp")
+
+    def __init__(self, mod_dir):
+        self.mod_dir = mod_dir
+        self.journal_path = os.path.join(mod_dir, self.JOURNAL)
+        self.staging = os.path.join(mod_dir, self.STAGING)
+        self.trash = os.path.join(mod_dir, self.TRASH)
+        self.state = None
+        self.groups = []
+        self.entries = []
+        self.config = None
+        self.mode = "copy"
+
+    @classmethod
+    def exists(cls, mod_dir):
+        return os.path.isfile(os.path.join(mod_dir, cls.JOURNAL))
+
+    @classmethod
+    def load(cls, mod_dir):
+        transaction = cls(mod_dir)
+        with open(transaction.journal_path, "r", encoding="utf-8") as f:
+            journal = json.load(f)
+        transaction.state = journal["state"]
+        transaction.groups = journal["groups"]
+        transaction.entries = journal["entries"]
+        transaction.config = journal["config"]
+        transaction.mode = journal.get("mode", "copy")
+        return transaction
+
+    def _save(self, state):
+        self.state = state
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "state": state, "mode": self.mode, "groups": self.groups,
+                       "entries": self.entries, "config": self.config}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.journal_path)
+
+    def _path(self, rel):
+        return os.path.join(self.mod_dir, fix_windows_path(rel, False))
+
+    def _staged(self, i):
+        return os.path.join(self.staging, str(i))
+
+    def apply(self, copies, config, mode="copy"):
+        # copies: [(src, dst)] absolute paths inside mod_dir, in plan order
+        latest = {}
+        for src, dst in copies:
+            latest.pop(dst, None)
+            latest[dst] = src
+        groups = {}
+        for dst, src in latest.items():
+            rel = lambda p: fix_windows_path(os.path.relpath(p, self.mod_dir), True)
+            groups.setdefault(rel(src), []).append(rel(dst))
+        self.groups = [[src, dsts] for src, dsts in groups.items()]
+        skip = set(self.KEEP) | {self.JOURNAL, self.STAGING, self.TRASH}
+        self.entries = [e for e in sorted(os.listdir(self.mod_dir)) if e not in skip]
+        self.config = config
+        self.mode = mode
+        os.makedirs(self.staging, exist_ok=True)
+        os.makedirs(self.trash, exist_ok=True)
+        self._save("staging")
+        return self.resume()
+
+    def resume(self):
+        stats = {"files": 0, "bytes": 0, "moved": 0, "copy": 0, "hardlink": 0, "reflink": 0, "skipped": 0}
+        if self.state == "staging":
+            for i, (src, _) in enumerate(self.groups):
+                if not os.path.lexists(self._staged(i)):
+                    os.rename(self._path(src), self._staged(i))
+            self._save("pruning")
+        if self.state == "pruning":
+            for entry in self.entries:
+                if os.path.lexists(os.path.join(self.mod_dir, entry)):
+                    os.rename(os.path.join(self.mod_dir, entry), os.path.join(self.trash, entry))
+            self._save("placing")
+        if self.state == "placing":
+            for dir_name in sorted({os.path.dirname(self._path(dst)) for _, dsts in self.groups for dst in dsts}):
+                os.makedirs(dir_name, exist_ok=True)
+            for i, (_, dsts) in enumerate(self.groups):
+                staged = self._staged(i)
+                if not os.path.lexists(staged):
+                    continue
+                size = os.path.getsize(staged)
+                for dst in dsts[:-1]:
+                    stats[place_file(staged, self._path(dst), self.mode)] += 1
+                os.replace(staged, self._path(dsts[-1]))
+                stats["moved"] += 1
+                stats["files"] += len(dsts)
+                stats["bytes"] += size * len(dsts)
+            self._save("finishing")
+        return stats
+
+    def write_config(self):
+        with open(os.path.join(self.mod_dir, "config.json"), "w+", encoding="utf-8") as f:
+            json.dump(self.config, f, ensure_ascii=False, indent=4)
+
+    def commit(self):
+        self._save("committing")
+        shutil.rmtree(self.trash, ignore_errors=True)
+        shutil.rmtree(self.staging, ignore_errors=True)
+        os.remove(self.journal_path)
+
+    def rollback(self):
+        if self.state in ("finishing", "committing"):
+            raise ValueError("files were already placed; resume the reslot instead of rolling it back")
+        if self.state == "placing":
+            # gather placed files back into staging; everything else in the folder is new content
+            for i, (_, dsts) in enumerate(self.groups):
+                last = self._path(dsts[-1])
+                if not os.path.lexists(self._staged(i)) and os.path.lexists(last):
+                    os.replace(last, self._staged(i))
+            for entry in os.listdir(self.mod_dir):
+                if entry in self.KEEP or entry in (self.JOURNAL, self.STAGING, self.TRASH):
+                    continue
+                path = os.path.join(self.mod_dir, entry)
+                if os.path.isdir(path) and not os.path.islink(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+        if self.state in ("pruning", "placing"):
+            for entry in self.entries:
+                if os.path.lexists(os.path.join(self.trash, entry)):
+                    os.rename(os.path.join(self.trash, entry), os.path.join(self.mod_dir, entry))
+        for i, (src, _) in enumerate(self.groups):
+            if os.path.lexists(self._staged(i)):
+                os.makedirs(os.path.dirname(self._path(src)), exist_ok=True)
+                os.rename(self._staged(i), self._path(src))
+        shutil.rmtree(self.trash, ignore_errors=True)
+        shutil.rmtree(self.staging, ignore_errors=True)
+        os.remove(self.journal_path)
@@ -10,6 +10,10 @@
 # Usage examples:
 #   Scan fighters and slots:
 #     python merged.py scan --mod-dir "C:\mods\my_mod"
+#   Scan a whole mods folder (one JSON line per mod, cached between runs):
+#     python merged.py scan --library "C:\mods"
+#   Find mods of a library that replace the same files / fighter slots, with free slots to move them to:
+#     python merged.py conflicts --library "C:\mods"
 #   Reslot (copy to new folder, exclude blanks):
 #     python merged.py reslot --mod-dir "C:\mods\my_mod" --hashes "Hashes_all.txt" --fighter mario \
 #       --map c00=c02 --map c01=c03 --share c00=c00 --share c01=c01 --clone --exclude-blanks
@@ -18,14 +22,51 @@
 #   Rename CSS fighter id/images and write PRCXML (set max colors):
 #     python merged.py reslot --mod-dir "C:\mods\my_mod" --hashes "Hashes_all.txt" --fighter sonic \
 #       --map c00=c10 --share c00=c00 --redirect-name knuckles --redirect-start 0 --prcxml-colors 12
+#   Reslot straight from an archive (.zip/.fpp/.7z); the result is written to a folder next to it:
+#     python merged.py reslot --mod-dir "C:\mods\my_mod.zip" --hashes "Hashes_all.txt" --fighter mario --map c00=c08 --clone
+#   Write one ui_chara_db.prcxml for several fighters:
+#     python merged.py prcxml --out "C:\mods\my_ui" --colors mario=12 --colors sonic=10
+#   Machine-readable progress (one JSON event per line on stdout; serve takes "events": true in params):
+#     python merged.py reslot --mod-dir "C:\mods\my_mod" --hashes "Hashes_all.txt" --fighter mario --map c00=c08 --clone --events ndjson
+#   Profile a slow reslot (per-stage cProfile dumps, memory peaks and counters in reslot_profile.json, written to
+#   <cache dir>/reslot-profile or --profile-out; legacy mode: set RESLOT_PROFILE=1 / RESLOT_TRACE_MEMORY=1 / RESLOT_PROFILE_OUT):
+#     python merged.py reslot --mod-dir "C:\mods\my_mod" --hashes "Hashes_all.txt" --fighter mario --map c00=c08 --clone --profile --trace-memory --profile-out "C:\reslot-profile"
+#   Compile the game directory index into the cache folder ahead of the first run (runs build it on demand):
+#     python merged.py compile-index --dir-info "dir_info_with_files_trimmed.json"
+#   Long-lived worker (line-delimited JSON-RPC on stdin/stdout, game indexes loaded once):
+#     python merged.py serve
+#   Several mods at once (a JSON list of the same params serve takes, one entry per mod):
+#     python merged.py batch jobs.json --jobs 8
+#     {"jsonrpc": "2.0", "id": 1, "method": "reslot", "params": {"mod_dir": "C:\mods\my_mod", "hashes": "Hashes_all.txt", "fighter": "mario", "map": ["c00=c08"], "clone": true}}
 #
+import time
+_IMPORT_STARTED = time.perf_counter()
 import os
 import sys
 import re
 import json
 import shutil
 import argparse
-import xml.etree.ElementTree as ET
+import io
+import hashlib
+import contextlib
+import concurrent.futures
+# zipfile/subprocess (archives) and xml.etree (prcxml) are imported where they are used
+
+# Subsystems live in the sibling modules; this file is the CLI and the core reslot logic
+import events
+from events import (TIMINGS, COUNTERS, EVENT_FORMATS, PROFILE_SUMMARY_FILE, PROFILE_DIR_NAME, PROFILE_ENV,
+                    TRACE_MEMORY_ENV, PROFILE_OUT_ENV, record_timing, emit_event, event_sink, ndjson_sink,
+                    event_stage, count, counted_membership, env_flag, profile_run, cli_profile)
+from cache import (DIR_INFO_FILE, set_cache_dir, cache_root, cache_path, _cached_resource, load_dir_info,
+                   game_dir_info_file, _load_known_files, compile_dir_info)
+from helpers import fix_windows_path, UniqueList, ExistingFiles, GetAssumedShareSlot
+from modindex import MOD_INDEX_VERSION, _mod_indexes, mod_index, reset_mod_indexes, _locate
+from place import (LINK_MODES, FINGERPRINTS, DEDUP_MODES, materialize, ReslotCache, dedupe_copies,
+                   placement_summary, InPlaceTransaction)
+from archive import is_mod_archive, ModArchive, write_archive
+from conflicts import library_mods, find_library_conflicts
+from serve import params_to_argv, run_captured, serve
 
 # --------------------------
 # Legacy usage (match reslotternoGUI.py)
@@ -37,93 +78,203 @@ def usage():
 # --------------------------
 # Shared helpers (from no-GUI)
 # --------------------------
-def makeDirsFromFile(path):
-    dirName = os.path.dirname(path)
-    try:
-        os.makedirs(dirName)
-    except:
-        pass
-
-def fix_windows_path(path: str, to_linux: bool):
-    if to_linux:
-        return path.replace("\\", "/")
-    else:
-        return path.replace("/", os.sep)
-
 def find_fighter_files(mod_directory):
-    all_files = []
-    for folders in os.listdir(mod_directory):
-        full_path = os.path.join(mod_directory, folders)
-        if os.path.isdir(full_path):
-            for root, dirs, files in os.walk(full_path):
-                if len(files) != 0:
-                    for file in files:
-                        full_file_path = os.path.join(root, file)
-                        toAppend = fix_windows_path(full_file_path, True).replace(mod_directory.replace("\\","/")+"/","")
-                        all_files.append(toAppend)
-    return all_files
+    return mod_index(mod_directory).files
+
+def unique_config(config):
+    # Rebuild the list sections of a config on UniqueList (keeps order and duplicates already present)
+    if isinstance(config["new-dir-infos"], list):
+        config["new-dir-infos"] = UniqueList(config["new-dir-infos"])
+    for section in ("new-dir-files", "share-to-vanilla", "share-to-added"):
+        if isinstance(config[section], dict):
+            config[section] = {key: UniqueList(files) if isinstance(files, list) else files
+                               for key, files in config[section].items()}
+    return config
 
 # Globals used by core reslot logic (kept to match original behavior)
 dirs_data = None
 file_array = None
-existing_files = []
+existing_files = ExistingFiles()
 existing_config = {}
 resulting_config = {}
+loaded_config = {}
 fighter_files = []
 known_files = set()
 
-def reslot_fighter_files(mod_directory, _fighter_files, current_alt, target_alt, share_slot, out_dir, fighter_name):
-    reslotted_files = []
-
-    if out_dir != "":
-        for file in _fighter_files:
-            if (not current_alt.strip('c') in file):
-                continue
-
-            lookfor = ""
-            replace = ""
-            new_file = ""
+# --------------------------
+# Game resources (loaded on first use)
+# --------------------------
+LAZY_RESOURCES = ("known-files", "dir-info")
+
+class LazyResource:
+    # Stand-in for a game resource that is loaded (and timed) on first use, so runs that never
+    # need it (vanilla-slot reslots, scans) don't pay for it
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.value = None
+
+    def get(self):
+        if self.value is None:
+            if not self.name:
+                self.value = self.loader()
+                return self.value
+            started = time.perf_counter()
+            # reported as the index stage, inside the stage that first needs the resource
+            with event_stage("index") as counts:
+                counts["resource"] = self.name
+                self.value = self.loader()
+            record_timing(self.name, started)
+        return self.value
+
+    def __contains__(self, item):
+        if events._membership_counter is not None:
+            count(events._membership_counter)
+        return item in self.get()
+
+    def __getitem__(self, key):
+        return self.get()[key]
+
+    def __len__(self):
+        return len(self.get())
+
+    def __iter__(self):
+        return iter(self.get())
+
+def report_timings():
+    total = (time.perf_counter() - _IMPORT_STARTED) * 1000
+    print("Timings (ms): " + ", ".join(f"{name} {ms:.1f}" for name, ms in TIMINGS.items()) + f", total {total:.1f}")
+    skipped = [name for name in LAZY_RESOURCES if name not in TIMINGS]
+    if skipped:
+        print("Not loaded:", ", ".join(skipped))
 
+# --------------------------
+# Reslot planner (one pass over the mod's files for every slot mapping)
+# --------------------------
+# Roots whose next path segment decides which fighter a file belongs to (prefix matched,
+# like the startswith checks of the original per-slot loop).
+PLAN_ROOTS = (
+    ("fighter/", ""),
+    ("sound/bank/fighter/", "se_"),
+    ("sound/bank/fighter_voice/", "vc_"),
+    ("effect/fighter/", ""),
+)
+class ModFileIndex:
+    # Built with a single pass over the mod's file list. Every lookup returns file positions in the
+    # original order, so per-slot results are identical to walking the whole list each time.
+    def __init__(self, files):
+        self.files = files
+        self.ui = []
+        self.roots = {root: {} for root, _ in PLAN_ROOTS}
+        self.by_component = {}
+        self.effect_like = []
+        self._candidates = {}
+        for position, file in enumerate(files):
             if file.startswith("ui/replace/chara") or file.startswith("ui/replace_patch/chara"):
-                lookfor = f"{current_alt.strip('c')}.bntx"
-                replace = f"{target_alt.strip('c')}.bntx"
-                new_file = file.replace(lookfor, replace)
-
-                fighter_keys = [fighter_name]
-                if (fighter_name=="popo" or fighter_name=="nana"):
-                    fighter_keys = ["ice_climber"]
-                elif (fighter_name=="eflame"):
-                    fighter_keys = ["eflame_first","eflame_only"]
-                elif (fighter_name=="elight"):
-                    fighter_keys = ["elight_first","elight_only"]
-
-                for key in fighter_keys:
-                    if new_file.__contains__("_" + key + "_") and out_dir != "":
-                        makeDirsFromFile(os.path.join(out_dir, new_file))
-                        shutil.copy(os.path.join(mod_directory, file), os.path.join(out_dir, new_file))
-                continue
-
-            if file.startswith(f"fighter/{fighter_name}"):
-                if (not "/"+current_alt+"/" in file):
-                    continue
-                lookfor = f"/{current_alt}/"
-                replace = f"/{target_alt}/"
-                new_file = file.replace(lookfor, replace)
-            elif file.startswith(f"sound/bank/fighter/se_{fighter_name}") or file.startswith(f"sound/bank/fighter_voice/vc_{fighter_name}"):
-                lookfor = f"_{current_alt}"
-                replace = f"_{target_alt}"
-                new_file = file.replace(lookfor, replace)
-            elif file.startswith(f"effect/fighter/{fighter_name}"):
-                lookfor = f"{current_alt.strip('c')}"
-                replace = f"{target_alt.strip('c')}"
-                new_file = file.replace(lookfor, replace)
-            else:
-                continue
+                self.ui.append(position)
+            for root, _ in PLAN_ROOTS:
+                if file.startswith(root):
+                    segment = file[len(root):].split("/", 1)[0]
+                    self.roots[root].setdefault(segment, []).append(position)
+                    break
+            if "effect/fighter/" in file:
+                self.effect_like.append(position)
+            for component in set(file.split("/")[1:]):
+                self.by_component.setdefault(component, []).append(position)
+
+    def candidates(self, fighter_name):
+        # files reslot_fighter_files may act on for this fighter, whatever the slot
+        if fighter_name not in self._candidates:
+            positions = list(self.ui)
+            for root, prefix in PLAN_ROOTS:
+                for segment, found in self.roots[root].items():
+                    if segment.startswith(prefix + fighter_name):
+                        positions.extend(found)
+            self._candidates[fighter_name] = [self.files[p] for p in sorted(positions)]
+        return self._candidates[fighter_name]
+
+    def slot_candidates(self, slot):
+        # files add_missing_files may act on for this target slot
+        if slot == "" or "/" in slot:
+            return self.files
+        positions = set(self.effect_like)
+        positions.update(self.by_component.get(slot, ()))
+        return [self.files[p] for p in sorted(positions)]
+
+_mod_file_index = None
+
+def get_mod_file_index(files):
+    global _mod_file_index
+    if _mod_file_index is None or _mod_file_index.files is not files:
+        _mod_file_index = ModFileIndex(files)
+    return _mod_file_index
+
+def reslot_targets(file, fighter_name, current_alt, target_alt):
+    # -> [(new_file, counts_as_reslotted)] following the original per-file rules
+    if (not current_alt.strip('c') in file):
+        return []
+
+    if file.startswith("ui/replace/chara") or file.startswith("ui/replace_patch/chara"):
+        lookfor = f"{current_alt.strip('c')}.bntx"
+        replace = f"{target_alt.strip('c')}.bntx"
+        new_file = file.replace(lookfor, replace)
+
+        fighter_keys = [fighter_name]
+        if (fighter_name=="popo" or fighter_name=="nana"):
+            fighter_keys = ["ice_climber"]
+        elif (fighter_name=="eflame"):
+            fighter_keys = ["eflame_first","eflame_only"]
+        elif (fighter_name=="elight"):
+            fighter_keys = ["elight_first","elight_only"]
+
+        # ui images are copied but not tracked as reslotted files
+        return [(new_file, False) for key in fighter_keys if new_file.__contains__("_" + key + "_")]
+
+    if file.startswith(f"fighter/{fighter_name}"):
+        if (not "/"+current_alt+"/" in file):
+            return []
+        lookfor = f"/{current_alt}/"
+        replace = f"/{target_alt}/"
+        new_file = file.replace(lookfor, replace)
+    elif file.startswith(f"sound/bank/fighter/se_{fighter_name}") or file.startswith(f"sound/bank/fighter_voice/vc_{fighter_name}"):
+        lookfor = f"_{current_alt}"
+        replace = f"_{target_alt}"
+        new_file = file.replace(lookfor, replace)
+    elif file.startswith(f"effect/fighter/{fighter_name}"):
+        lookfor = f"{current_alt.strip('c')}"
+        replace = f"{target_alt.strip('c')}"
+        new_file = file.replace(lookfor, replace)
+    else:
+        return []
+    return [(new_file, True)]
+
+# (fighter, current_alt, target_alt) -> [(file, new_file, counts_as_reslotted)]
+slot_plans = {}
+# (source path, destination path) queued by reslot_fighter_files until materialize() runs
+pending_copies = []
+
+def plan_slot_copies(fighter_name, pairs, _fighter_files=None):
+    # One sweep over this fighter's candidate files produces the copy list of every mapping
+    index = get_mod_file_index(fighter_files if _fighter_files is None else _fighter_files)
+    plans = {(fighter_name, current_alt, target_alt): [] for current_alt, target_alt in pairs}
+    for file in index.candidates(fighter_name):
+        for (_, current_alt, target_alt), ops in plans.items():
+            for new_file, tracked in reslot_targets(file, fighter_name, current_alt, target_alt):
+                ops.append((file, new_file, tracked))
+    slot_plans.update(plans)
+    return plans
 
-            makeDirsFromFile(os.path.join(out_dir, new_file))
-            shutil.copy(os.path.join(mod_directory, file), os.path.join(out_dir, new_file))
+def reslot_fighter_files(mod_directory, _fighter_files, current_alt, target_alt, share_slot, out_dir, fighter_name):
+    reslotted_files = []
 
-            reslotted_files.append(new_file)
+    if out_dir != "":
+        key = (fighter_name, current_alt, target_alt)
+        if key not in slot_plans:
+            plan_slot_copies(fighter_name, [(current_alt, target_alt)], _fighter_files)
+        for file, new_file, tracked in slot_plans[key]:
+            pending_copies.append((os.path.join(mod_directory, file), os.path.join(out_dir, new_file)))
+            if tracked:
+                reslotted_files.append(new_file)
 
     existing_files.extend(reslotted_files)
     if 7 < int(target_alt.strip("c")):
@@ -141,43 +292,45 @@ def reslot_fighter_files(mod_directory, _fighter_files, current_alt, target_alt,
 
     return reslotted_files, _fighter_files
 
+# Reslotted files with these extensions or names are custom even when the game has a file by that name
+CUSTOM_EXTENSIONS = frozenset([
+    '.nuanmb', '.marker', '.bin', '.tonelabel', '.numatb', '.numdlb', '.nutexb',
+    '.numshb', '.numshexb', '.nus3audio', '.nus3bank', '.nuhlpb', '.xmb', '.kime', '.eff'
+])
+CUSTOM_NAME_MARKERS = ('body', 'face', 'hair', 'eye', 'brs_', 'bust_', 'hand_')
+
+@counted_membership("membership_checks.add_missing_files")
 def add_missing_files(reslotted_files, fighter_name, target_alt, is_new_slot=False):
     new_dir_info = f"fighter/{fighter_name}/{target_alt}"
     if new_dir_info not in resulting_config["new-dir-files"]:
-        resulting_config["new-dir-files"][new_dir_info] = []
+        resulting_config["new-dir-files"][new_dir_info] = UniqueList()
 
     camera_dir_info = f"fighter/{fighter_name}/{target_alt}/camera"
     if camera_dir_info not in resulting_config["new-dir-files"]:
-        resulting_config["new-dir-files"][camera_dir_info] = []
+        resulting_config["new-dir-files"][camera_dir_info] = UniqueList()
 
     transplant_dir_info = f"fighter/{fighter_name}/cmn"
     if transplant_dir_info not in resulting_config["new-dir-files"]:
-        resulting_config["new-dir-files"][transplant_dir_info] = []
+        resulting_config["new-dir-files"][transplant_dir_info] = UniqueList()
 
     old_camera_dir = f"fighter/{fighter_name}/camera/{target_alt}"
     if old_camera_dir in resulting_config["new-dir-files"]:
         del resulting_config["new-dir-files"][old_camera_dir]
 
-    custom_extensions = [
-        '.nuanmb', '.marker', '.bin', '.tonelabel', '.numatb', '.numdlb', '.nutexb',
-        '.numshb', '.numshexb', '.nus3audio', '.nus3bank', '.nuhlpb', '.numdlb', '.xmb', '.kime', '.eff'
-    ]
-    custom_files = []
+    custom_files = UniqueList()
     camera_files = []
-    transplant_files = []
-    effect_files = []
+    transplant_files = UniqueList()
+    effect_files = UniqueList()
 
-    for file in fighter_files:
+    for file in get_mod_file_index(fighter_files).slot_candidates(target_alt):
         transplant_path = f"effect/fighter/{fighter_name}/transplant/"
         if transplant_path in file:
-            if file not in transplant_files:
-                transplant_files.append(file)
+            transplant_files.add(file)
             continue
 
         effect_path = f"effect/fighter/{fighter_name}/ef_{fighter_name}_{target_alt}"
         if effect_path in file:
-            if file not in effect_files:
-                effect_files.append(file)
+            effect_files.add(file)
             continue
 
         if f"/{target_alt}/" in file or file.endswith(f"/{target_alt}"):
@@ -188,30 +341,26 @@ def add_missing_files(reslotted_files, fighter_name, target_alt, is_new_slot=Fal
 
             file_ext = os.path.splitext(file)[1].lower()
             is_custom = False
-            if file_ext in custom_extensions:
+            if file_ext in CUSTOM_EXTENSIONS:
                 is_custom = True
             if file not in known_files:
                 is_custom = True
-            if any(marker in file.lower() for marker in ['body', 'face', 'hair', 'eye', 'brs_', 'bust_', 'hand_']):
+            if any(marker in file.lower() for marker in CUSTOM_NAME_MARKERS):
                 is_custom = True
             if is_custom:
                 custom_files.append(file)
 
     for custom_file in custom_files:
-        if custom_file not in resulting_config["new-dir-files"][new_dir_info]:
-            resulting_config["new-dir-files"][new_dir_info].append(custom_file)
+        resulting_config["new-dir-files"][new_dir_info].add(custom_file)
 
     for effect_file in effect_files:
-        if effect_file not in resulting_config["new-dir-files"][new_dir_info]:
-            resulting_config["new-dir-files"][new_dir_info].append(effect_file)
+        resulting_config["new-dir-files"][new_dir_info].add(effect_file)
 
     for camera_file in camera_files:
-        if camera_file not in resulting_config["new-dir-files"][camera_dir_info]:
-            resulting_config["new-dir-files"][camera_dir_info].append(camera_file)
+        resulting_config["new-dir-files"][camera_dir_info].add(camera_file)
 
     for transplant_file in transplant_files:
-        if transplant_file not in resulting_config["new-dir-files"][transplant_dir_info]:
-            resulting_config["new-dir-files"][transplant_dir_info].append(transplant_file)
+        resulting_config["new-dir-files"][transplant_dir_info].add(transplant_file)
 
     for file in reslotted_files:
         if file.startswith(f"camera/fighter/{fighter_name}/{target_alt}/"):
@@ -221,9 +370,7 @@ def add_missing_files(reslotted_files, fighter_name, target_alt, is_new_slot=Fal
         if (not is_new_slot and "effect" in file):
             continue
         if file not in known_files and file not in custom_files:
-            if file in resulting_config["new-dir-files"][new_dir_info]:
-                continue
-            resulting_config["new-dir-files"][new_dir_info].append(file)
+            resulting_config["new-dir-files"][new_dir_info].add(file)
 
 def add_new_slot(dir_info, source_slot, new_slot, share_slot):
     folders = dir_info.split("/")
@@ -238,8 +385,7 @@ def add_new_slot(dir_info, source_slot, new_slot, share_slot):
         share_slot_dir = target_dir["directories"][share_slot]
         share_slot_path = "%s/%s" % ((dir_info, share_slot))
 
-        if (not new_slot_dir_path in resulting_config["new-dir-infos"]):
-            resulting_config["new-dir-infos"].append(new_slot_dir_path)
+        resulting_config["new-dir-infos"].add(new_slot_dir_path)
 
         addFilesToDirInfo(new_slot_dir_path, share_slot_dir["files"], new_slot)
         addSharedFiles(share_slot_dir["files"], source_slot, new_slot,share_slot)
@@ -259,8 +405,7 @@ def add_new_slot(dir_info, source_slot, new_slot, share_slot):
             share_slot_dir = target_obj["directories"][share_slot]
             share_slot_path = f"{dir_info}/{dir}/{share_slot}"
 
-            if (not new_slot_dir_path in resulting_config["new-dir-infos"]):
-                resulting_config["new-dir-infos"].append(new_slot_dir_path)
+            resulting_config["new-dir-infos"].add(new_slot_dir_path)
 
             addFilesToDirInfo(new_slot_dir_path, share_slot_dir["files"], new_slot)
             addSharedFiles(share_slot_dir["files"], source_slot, new_slot,share_slot)
@@ -273,21 +418,20 @@ def add_new_slot(dir_info, source_slot, new_slot, share_slot):
 
 def addFilesToDirInfo(dir_info, files, target_color):
     if dir_info not in resulting_config["new-dir-files"]:
-        resulting_config["new-dir-files"][dir_info] = []
+        resulting_config["new-dir-files"][dir_info] = UniqueList()
     for index in files:
         file_path = file_array[index]
         if file_path.startswith("0x"):
             continue
         new_file_path = re.sub(r"c0[0-9]", target_color, file_path, 1)
-        if new_file_path in resulting_config["new-dir-files"][dir_info]:
-            continue
-        resulting_config["new-dir-files"][dir_info].append(new_file_path)
+        resulting_config["new-dir-files"][dir_info].add(new_file_path)
 
 def IsShareableSound(sound_file):
     return True
 
+@counted_membership("membership_checks.addSharedFiles")
 def addSharedFiles(src_files, source_color, target_color, share_slot):
-    used_files = []
+    used_files = set()
     never_share_extensions = ['.nutexb']
     for index in src_files:
         file_path = file_array[index]
@@ -295,7 +439,7 @@ def addSharedFiles(src_files, source_color, target_color, share_slot):
             continue
         if file_path.replace(r"/c0[0-9]/", source_color) in used_files:
             continue
-        used_files.append(file_path)
+        used_files.add(file_path)
 
         new_file_path = re.sub(r"c0[0-9]", target_color, file_path, 1)
         if new_file_path in existing_files:
@@ -303,13 +447,8 @@ def addSharedFiles(src_files, source_color, target_color, share_slot):
 
         file_ext = os.path.splitext(file_path)[1].lower()
         if file_ext in never_share_extensions:
-            similar_files_exist = False
             dir_name = os.path.dirname(new_file_path)
-            for existing_file in existing_files:
-                if dir_name in existing_file:
-                    similar_files_exist = True
-                    break
-            if similar_files_exist:
+            if existing_files.contains_substring(dir_name):
                 continue
 
         share_to = "share-to-vanilla"
@@ -319,54 +458,98 @@ def addSharedFiles(src_files, source_color, target_color, share_slot):
             share_to = "share-to-added"
 
         if file_path not in resulting_config[share_to]:
-            resulting_config[share_to][file_path] = []
-        if new_file_path not in resulting_config[share_to][file_path]:
-            resulting_config[share_to][file_path].append(new_file_path)
+            resulting_config[share_to][file_path] = UniqueList()
+        resulting_config[share_to][file_path].add(new_file_path)
 
 def RecursiveRewrite(info,current_alt,target_alt):
     print(info.replace(current_alt,target_alt))
     return info.replace(current_alt,target_alt)
 
-def core_init(hashes_file, mod_directory, newConfig):
-    global dirs_data, file_array, existing_files, existing_config, resulting_config, fighter_files, known_files
-
-    fighter_files = find_fighter_files(mod_directory)
-    known_files = set(map(lambda x: x.strip(), open(hashes_file, 'r', encoding='utf-8', errors='ignore').readlines()))
-
-    existing_config = {
-        "new-dir-infos": [],
-        "new-dir-infos-base": {},
-        "share-to-vanilla": {},
-        "new-dir-files": {},
-        "share-to-added": {}
-    }
-
-    if (not newConfig):
-        existing_config_file = os.path.join(mod_directory, "config.json")
-        if (os.path.isfile(existing_config_file)):
-            try:
-                with open(existing_config_file, "r", encoding='utf-8') as f:
-                    config = json.load(f)
-                    if "new-dir-infos" in config:
-                        existing_config["new-dir-infos"] = config["new-dir-infos"]
-                    if "new-dir-infos-base" in config:
-                        existing_config["new-dir-infos-base"] = config["new-dir-infos-base"]
-                    if "share-to-vanilla" in config:
-                        existing_config["share-to-vanilla"] = config["share-to-vanilla"]
-                    if "new-dir-files" in config:
-                        existing_config["new-dir-files"] = config["new-dir-files"]
-                    if "share-to-added" in config:
-                        existing_config["share-to-added"] = config["share-to-added"]
-            except Exception as e:
-                print(f"Warning: failed to load existing config.json: {e}")
-
-    resulting_config = existing_config
-    existing_files = fighter_files.copy()
-
-    with open("dir_info_with_files_trimmed.json", "r", encoding='utf-8') as f:
-        res = json.load(f)
-        dirs_data = res["dirs"]
-        file_array = res["file_array"]
+class ReslotContext:
+    # State of one reslot job: the mod's files, the config being built and the planned copies.
+    # The core functions work on the module globals of the same names; bind() points them at this
+    # context. Each worker process of a parallel run binds its own context.
+    SECTIONS = ["new-dir-infos", "new-dir-infos-base", "share-to-vanilla", "new-dir-files", "share-to-added"]
+
+    def __init__(self, hashes_file, mod_directory, newConfig, files=None):
+        self.hashes_file = hashes_file
+        self.mod_directory = mod_directory
+        self.new_config = newConfig
+        self.fighter_files = find_fighter_files(mod_directory) if files is None else list(files)
+        self.known_files = LazyResource("known-files", lambda: _cached_resource(hashes_file, _load_known_files))
+        self.slot_plans = {}
+        self.pending_copies = []
+
+        self.existing_config = {
+            "new-dir-infos": [],
+            "new-dir-infos-base": {},
+            "share-to-vanilla": {},
+            "new-dir-files": {},
+            "share-to-added": {}
+        }
+
+        if (not newConfig):
+            existing_config_file = os.path.join(mod_directory, "config.json")
+            if (os.path.isfile(existing_config_file)):
+                try:
+                    with open(existing_config_file, "r", encoding='utf-8') as f:
+                        config = json.load(f)
+                        for section in self.SECTIONS:
+                            if section in config:
+                                self.existing_config[section] = config[section]
+                except Exception as e:
+                    print(f"Warning: failed to load existing config.json: {e}")
+
+        self.loaded_config = json.loads(json.dumps(self.existing_config))
+        self.resulting_config = unique_config(self.existing_config)
+        self.existing_files = ExistingFiles(self.fighter_files)
+        dir_info = LazyResource("dir-info", lambda: load_dir_info(game_dir_info_file(hashes_file)))
+        self.dirs_data = LazyResource(None, lambda: dir_info.get()[0])
+        self.file_array = LazyResource(None, lambda: dir_info.get()[1])
+
+    def bind(self):
+        global dirs_data, file_array, existing_files, existing_config, resulting_config, loaded_config, fighter_files, known_files
+        global slot_plans, pending_copies
+        dirs_data, file_array = self.dirs_data, self.file_array
+        existing_files, existing_config = self.existing_files, self.existing_config
+        resulting_config, loaded_config = self.resulting_config, self.loaded_config
+        fighter_files, known_files = self.fighter_files, self.known_files
+        slot_plans, pending_copies = self.slot_plans, self.pending_copies
+        return self
+
+    def fragment(self):
+        # picklable result of a worker job; resulting_config may have been replaced by core_run
+        return {"config": json.loads(json.dumps(self.resulting_config)), "copies": list(self.pending_copies)}
+
+def core_init(hashes_file, mod_directory, newConfig, files=None):
+    # files: the mod's file list when it does not come from walking mod_directory (archives)
+    started = time.perf_counter()
+    context = ReslotContext(hashes_file, mod_directory, newConfig, files).bind()
+    record_timing("context", started)
+    return context
+
+def merge_config_fragment(merged, base, fragment, fighter_name):
+    # Fold the config a worker built for one fighter (starting from `base`) into `merged`,
+    # giving the same result as running the fighters one after another.
+    for item in fragment["new-dir-infos"]:
+        merged["new-dir-infos"].add(item)
+    for section in ReslotContext.SECTIONS[1:]:
+        target = merged[section]
+        for key in base[section]:
+            if key not in fragment[section]:
+                target.pop(key, None)
+        for key, value in fragment[section].items():
+            if isinstance(value, list):
+                if key not in target:
+                    target[key] = UniqueList()
+                for item in value:
+                    target[key].add(item)
+            else:
+                target[key] = value
+    # core_run keeps each fighter's transplant effects last
+    cmn_key = f"fighter/{fighter_name}/cmn"
+    if cmn_key in merged["new-dir-files"]:
+        merged["new-dir-files"][cmn_key] = merged["new-dir-files"].pop(cmn_key)
 
 def core_run(mod_directory, hashes_file, fighter_name, current_alt, target_alt, share_slot, out_dir):
     reslotted_files, _ = reslot_fighter_files(mod_directory, fighter_files, current_alt, target_alt, share_slot, out_dir, fighter_name)
@@ -391,8 +574,12 @@ def main(mod_directory, hashes_file, fighter_name, current_alt, target_alt, shar
     if (not os.path.exists(out_dir)) and out_dir != "":
         os.makedirs(out_dir, exist_ok=True)
 
-    # run core reslot and config accumulation
-    core_run(mod_directory, hashes_file, fighter_name, current_alt, target_alt, share_slot, out_dir)
+    # run core reslot and config accumulation, then place the planned files
+    with event_stage("plan") as counts:
+        core_run(mod_directory, hashes_file, fighter_name, current_alt, target_alt, share_slot, out_dir)
+        counts["files"] = len(pending_copies)
+    materialize(pending_copies)
+    pending_copies.clear()
 
     # order config sections like withgui
     ordered = ordered_config_dict(resulting_config)
@@ -408,11 +595,14 @@ def main(mod_directory, hashes_file, fighter_name, current_alt, target_alt, shar
                 pass
 
     # write config.json to the target directory
-    try:
-        with open(os.path.join(target_dir, 'config.json'), 'w+', encoding='utf-8') as f:
-            json.dump(ordered if ordered else resulting_config, f, ensure_ascii=False, indent=4)
-    except Exception as e:
-        print(f"Warning: failed to write config.json: {e}")
+    with event_stage("config") as counts:
+        try:
+            with open(os.path.join(target_dir, 'config.json'), 'w+', encoding='utf-8') as f:
+                json.dump(ordered if ordered else resulting_config, f, ensure_ascii=False, indent=4)
+        except Exception as e:
+            print(f"Warning: failed to write config.json: {e}")
+        counts["entries"] = count_config_entries(ordered if ordered else resulting_config)
+    count("config_entries_added", counts["entries"] - count_config_entries(loaded_config))
 
 # --------------------------
 # CLI Orchestration
@@ -445,7 +635,7 @@ def IsValidSearch(searchDir):
     if (not os.path.isdir(searchDir)):
         return False
     whitelist = ["fighter","sound","ui"]
-    subfolders = [f.path for f in os.scandir(searchDir) if f.is_dir()]
+    subfolders = mod_index(searchDir).subdirs()
     for dirname in list(subfolders):
         for w in list(whitelist):
             folderName = os.path.basename(dirname)
@@ -462,15 +652,15 @@ def find_nth(haystack, needle, n):
 
 def GetSlotsFromFolder(folder):
     foundSlots = []
-    if (not os.path.isdir(folder)):
+    index, rel = _locate(folder) if os.path.isdir(folder) else (None, None)
+    if (index is None or not index.isdir(rel)):
         return foundSlots
 
     # find slots (immediate subdirectories of model/motion folders)
-    modelfolders = [f.path for f in os.scandir(folder) if f.is_dir()]
+    modelfolders = [f"{rel}/{name}" if rel else name for name in index.subdirs(rel)]
     for m in modelfolders:
-        slots = [f.path for f in os.scandir(m) if f.is_dir()]
-        for s in slots:
-            slot = os.path.basename(s)
+        slots = index.subdirs(m)
+        for slot in slots:
             if not slot in foundSlots:
                 foundSlots.append(slot)
     return foundSlots
@@ -501,8 +691,9 @@ def GetFightersFromFiles(folders, fighter=""):
         if (base == "replace" or base == "replace_patch"):
             # look under chara
             chara_dir = os.path.join(f, "chara")
-            if os.path.isdir(chara_dir):
-                fighterfolders = [os.path.join(chara_dir, d) for d in os.listdir(chara_dir) if os.path.isdir(os.path.join(chara_dir, d))]
+            index, rel = _locate(f)
+            if index.isdir(f"{rel}/chara" if rel else "chara"):
+                fighterfolders = [os.path.join(chara_dir, d) for d in index.subdirs(f"{rel}/chara" if rel else "chara")]
                 sub_fighters, sub_slots = GetFightersFromFiles(fighterfolders, fighter)
                 for fi in sub_fighters:
                     if fi not in fighters:
@@ -512,7 +703,8 @@ def GetFightersFromFiles(folders, fighter=""):
                         slots.append(si)
             continue
 
-        for (dirpath, dirnames, filenames) in os.walk(f):
+        index, rel = _locate(f)
+        for (dirpath, dirnames, filenames) in index.walk(rel):
             for filename in filenames:
                 # need last and second to last '_'
                 unders = filename.count("_")
@@ -548,20 +740,21 @@ def SetFighters(mod_dir, fighter=""):
     fighterFolder = os.path.join(mod_dir, "fighter")
     uiFolder = os.path.join(mod_dir, "ui")
     soundFolder = os.path.join(mod_dir, "sound", "bank")
+    index = mod_index(mod_dir)
 
-    if (not os.path.isdir(fighterFolder)):
+    if (not index.isdir("fighter")):
         # check ui
-        if os.path.isdir(uiFolder):
-            uifolders = [os.path.join(uiFolder, d) for d in os.listdir(uiFolder) if os.path.isdir(os.path.join(uiFolder, d))]
+        if index.isdir("ui"):
+            uifolders = [os.path.join(uiFolder, d) for d in index.subdirs("ui")]
             fighters, slots = GetFightersFromFiles(uifolders, fighter)
-        elif os.path.isdir(soundFolder):
-            soundfolders = [os.path.join(soundFolder, d) for d in os.listdir(soundFolder) if os.path.isdir(os.path.join(soundFolder, d))]
+        elif index.isdir("sound/bank"):
+            soundfolders = [os.path.join(soundFolder, d) for d in index.subdirs("sound/bank")]
             fighters, slots = GetFightersFromFiles(soundfolders, fighter)
         else:
             # no recognizable structure
             return [], []
     else:
-        fighterfolders = [os.path.join(fighterFolder, d) for d in os.listdir(fighterFolder) if os.path.isdir(os.path.join(fighterFolder, d))]
+        fighterfolders = [os.path.join(fighterFolder, d) for d in index.subdirs("fighter")]
         fighters, slots = GetFightersFromFolders(fighterfolders, fighter)
 
     if fighter == "":
@@ -573,45 +766,30 @@ def SetFighters(mod_dir, fighter=""):
 Climber = ["popo", "nana"]
 Trainer = ["ptrainer","ptrainer_low","pzenigame","pfushigisou","plizardon"]
 Aegis = ["element","eflame","elight"]
-
-def GetAssumedShareSlot(source, fighter):
-    altsLast2 = ["edge","szerosuit","littlemac","mario","metaknight","jack"]
-    altsOdd = ["bayonetta","master","cloud","kamui","ike","shizue","demon",
-    "link","packun","reflet","wario","wiifit",
-    "ptrainer","ptrainer_low","pfushigisou","plizardon","pzenigame"]
-    altsAll = ["koopajr","murabito","purin","pikachu","pichu","sonic"]
-    if fighter == "brave" or fighter == "trail":
-        return source % 4
-    elif fighter == "pikmin" or fighter == "popo" or fighter == "nana":
-        return 0 if (source<4) else 4
-    elif fighter == "pacman":
-        return 0 if (source==0 or source==7) else source
-    elif fighter == "ridley":
-        return 0 if (source==1 or source==7) else source
-    elif fighter == "inkling" or fighter=="pickel":
-        return source%2 if source<6 else source
-    elif fighter == "shulk":
-        return 0 if source<7 else 7
-    elif fighter in altsLast2:
-        return 0 if source<6 else source
-    elif fighter in altsAll:
-        return source
-    elif fighter in altsOdd:
-        return source % 2
-    else:
-        return 0
+# fighter -> every fighter reslotted with it
+FIGHTER_GROUPS = {fighter: group for group in (Climber, Trainer, Aegis) for fighter in group}
+# fighter -> its entries in ui_chara_db (the groups share entries that aren't named after them)
+PRCXML_GROUP_INDEXES = {**{fighter: (17,) for fighter in Climber},
+                        **{fighter: (38, 39, 40, 41) for fighter in Trainer},
+                        **{fighter: (114, 115, 116, 117, 118) for fighter in Aegis}}
 
 def CreatePRCXML(fighter, targetDir, new_max_colors):
     # Minimal CLI-friendly variant of CreatePRCXML from withgui.py
     # new_max_colors: integer
+    CreateMergedPRCXML([(fighter, new_max_colors)], targetDir)
+
+def CreateMergedPRCXML(fighter_colors, targetDir):
+    # One ui_chara_db.prcxml setting color_num for every (fighter, max colors) pair
+    with event_stage("prcxml") as counts:
+        counts["fighters"] = len(fighter_colors)
+        _create_merged_prcxml(fighter_colors, targetDir)
+
+def _create_merged_prcxml(fighter_colors, targetDir):
     try:
-        prcFile = "/ui_chara_db.prcxml"
-        cwd = os.getcwd()
-        src_prcxml = os.path.join(cwd, prcFile.lstrip('/'))
-        src_txt = src_prcxml.replace('prcxml','txt')
-        if (not os.path.isfile(src_prcxml) or not os.path.isfile(src_txt)):
-            print("Missing ui_chara_db.prcxml or ui_chara_db.txt in program directory! Cannot create a prcxml")
+        sources = prcxml_sources()
+        if sources is None:
             return
+        src_prcxml, src_txt = sources
 
         prcLocation = os.path.join(targetDir, "ui", "param", "database")
         try:
@@ -620,99 +798,374 @@ def CreatePRCXML(fighter, targetDir, new_max_colors):
             pass
 
         target_path = os.path.join(prcLocation, "ui_chara_db.prcxml")
+        colors = prcxml_target_colors(fighter_colors, src_txt)
+        if not colors:
+            return
+        with open(target_path, 'wb') as f:
+            write_prcxml(src_prcxml, f, colors)
+        print("Created prcxml at", target_path)
+    except Exception as e:
+        print("CreatePRCXML error:", e)
 
-        # Read index list from txt
-        with open(src_txt, 'r', encoding='utf-8', errors='replace') as indexFile:
-            indexes = [line.rstrip() for line in indexFile.readlines()]
-
-        targetIndexes = []
-        if (fighter in Climber):
-            targetIndexes = [17]
-        elif (fighter in Trainer):
-            targetIndexes = [38,39,40,41]
-        elif (fighter in Aegis):
-            targetIndexes = [114,115,116,117,118]
-        else:
-            for i in range(len(indexes)):
-                if (fighter == indexes[i].lower()):
-                    targetIndexes.append(i)
-
+def prcxml_sources():
+    # (ui_chara_db.prcxml, ui_chara_db.txt) from the program directory
+    prcFile = "/ui_chara_db.prcxml"
+    cwd = os.getcwd()
+    src_prcxml = os.path.join(cwd, prcFile.lstrip('/'))
+    src_txt = src_prcxml.replace('prcxml','txt')
+    if (not os.path.isfile(src_prcxml) or not os.path.isfile(src_txt)):
+        print("Missing ui_chara_db.prcxml or ui_chara_db.txt in program directory! Cannot create a prcxml")
+        return None
+    return src_prcxml, src_txt
+
+def _load_fighter_indexes(src_txt):
+    # fighter name (lowercase) -> its ui_chara_db indexes, from the index list in ui_chara_db.txt
+    indexes = {}
+    with open(src_txt, 'r', encoding='utf-8', errors='replace') as indexFile:
+        for i, line in enumerate(indexFile):
+            indexes.setdefault(line.rstrip().lower(), []).append(i)
+    return indexes
+
+def prcxml_target_colors(fighter_colors, src_txt):
+    # [(fighter, max colors)] -> {ui_chara_db index (as in the prcxml): color_num}
+    indexes = _cached_resource(src_txt, _load_fighter_indexes)
+    colors = {}
+    for fighter, new_max_colors in fighter_colors:
+        targetIndexes = PRCXML_GROUP_INDEXES.get(fighter) or indexes.get(fighter, [])
         if (len(targetIndexes)==0):
             print("prcxml error: could not find fighter index")
+            continue
+        for targetIndex in targetIndexes:
+            colors[str(targetIndex)] = str(new_max_colors)
+    return colors
+
+def _load_prcxml_template(src_prcxml):
+    # Stream the prcxml once into its serialized bytes, split around the hash40 entries that
+    # write_prcxml may replace: [bytes, (index, entry bytes, entry attributes), bytes, ...].
+    # Each element is written as soon as it is complete and then dropped, so the database is never
+    # held in memory as a tree; the bytes match ET.tostring() of the fully parsed tree.
+    import xml.etree.ElementTree as ET
+    started = time.perf_counter()
+    segments = []
+    out = io.BytesIO()
+    out.write(b"<?xml version=\"1.0\" encoding=\"UTF-16\"?>\n")
+    parser = ET.XMLPullParser(events=("start", "end"))
+    stack = []
+    opened = set()
+    pending = []  # the last finished element, until its tail text is known
+
+    def flush():
+        if pending:
+            tail = (pending.pop().tail or "").replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+            out.write(tail.encode("ascii", "xmlcharrefreplace"))
+
+    def open_tag(elem):
+        flush()
+        shallow = ET.Element(elem.tag, elem.attrib)
+        shallow.text = elem.text
+        data = ET.tostring(shallow, short_empty_elements=False)
+        out.write(data[:-len(f"</{elem.tag}>")])
+        opened.add(id(elem))
+
+    def handle(event, elem):
+        if event == "start":
+            if stack and id(stack[-1]) not in opened:
+                open_tag(stack[-1])
+            else:
+                flush()
+            stack.append(elem)
             return
+        stack.pop()
+        flush()
+        if id(elem) in opened:
+            opened.discard(id(elem))
+            out.write(f"</{elem.tag}>".encode("ascii", "xmlcharrefreplace"))
+        else:
+            tail, elem.tail = elem.tail, None
+            data = ET.tostring(elem)
+            elem.tail = tail
+            if elem.tag == 'hash40' and 'index' in elem.attrib:
+                segments.append(out.getvalue())
+                segments.append((elem.attrib['index'], data, dict(elem.attrib)))
+                out.seek(0)
+                out.truncate()
+            else:
+                out.write(data)
+        pending.append(elem)
+        if stack:
+            stack[-1].remove(elem)
+
+    with open(src_prcxml, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            parser.feed(chunk)
+            for event, elem in parser.read_events():
+                handle(event, elem)
+    parser.close()
+    for event, elem in parser.read_events():
+        handle(event, elem)
+    flush()
+    segments.append(out.getvalue())
+    record_timing("prcxml-template", started)
+    return segments
+
+def write_prcxml(src_prcxml, out, colors):
+    # Write a copy of the prcxml to the binary file `out`, turning the hash40 entries listed in
+    # colors into <struct><byte hash="color_num">N</byte></struct>
+    import xml.etree.ElementTree as ET
+    for segment in _cached_resource(src_prcxml, _load_prcxml_template):
+        if isinstance(segment, bytes):
+            out.write(segment)
+        elif segment[0] in colors:
+            entry = ET.Element('struct', segment[2])
+            info = ET.SubElement(entry, 'byte')
+            info.set('hash', 'color_num')
+            info.text = colors[segment[0]]
+            out.write(ET.tostring(entry))
+        else:
+            out.write(segment[1])
 
-        # Very small XML rewrite: copy and replace matching hash40 elements
-        # We'll parse original prcxml and write a filtered copy setting color_num
-        context = ET.iterparse(src_prcxml, events=('end',))
-        out_root = None
-        # write a fresh file with UTF-16 encoding header
-        for event, elem in context:
-            if elem.tag == 'hash40':
-                index = elem.attrib.get('index')
-                for targetIndex in targetIndexes:
-                    if str(index) == str(targetIndex):
-                        elem.text = ''
-                        elem.tag = 'struct'
-                        info = ET.SubElement(elem, 'byte')
-                        info.set('hash', 'color_num')
-                        info.text = str(new_max_colors)
-        # Write out last element to file (compatible with original simplified behavior)
-        with open(target_path, 'wb') as f:
-            f.write(b"<?xml version=\"1.0\" encoding=\"UTF-16\"?>\n")
-            # attempt to write the last parsed element
+def walk_ui_files(targetFolder):
+    # (dirpath, filename) for ui/replace then ui/replace_patch, in a stable top-down order
+    for folder in [os.path.join(targetFolder, 'ui', 'replace'), os.path.join(targetFolder, 'ui', 'replace_patch')]:
+        if not os.path.isdir(folder):
+            continue
+        for (dirpath, dirnames, filenames) in os.walk(folder):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                yield dirpath, filename
+
+# ui file names use these keys instead of the fighter folder name
+UI_RENAME_KEYS = {"popo": ("ice_climber",), "nana": ("ice_climber",),
+                  "eflame": ("eflame_first", "eflame_only"), "elight": ("elight_first", "elight_only")}
+
+def plan_rename_ui(ui_files, fighter_name, newname, startid=0):
+    # ui_files: [(dirpath, filename)] in visiting order -> [(file, newfile)]
+    renames = []
+    newid = int(startid or 0)
+    keys = [("_"+oldname+"_", "_"+newname+"_") for oldname in UI_RENAME_KEYS.get(fighter_name, (fighter_name,))]
+    marker = newname+"_"
+
+    for dirpath, filename in ui_files:
+        for old, new in keys:
+            newfilename = filename.replace(old, new)
+            if marker not in newfilename:
+                continue
             try:
-                f.write(ET.tostring(elem))
-            except Exception:
-                pass
-        print("Created prcxml at", target_path)
-    except Exception as e:
-        print("CreatePRCXML error:", e)
+                costumeslot = newfilename.index(marker)
+                newfilename = newfilename[:costumeslot] + marker + "{:02d}".format(newid) + ".bntx"
+            except ValueError:
+                # fallback: append newid
+                base, ext = os.path.splitext(newfilename)
+                newfilename = f"{base}_{newid:02d}{ext}"
+            newfile = os.path.join(dirpath.replace("/ui/replace_patch","/ui/replace"), newfilename)
+            renames.append((os.path.join(dirpath, filename), newfile))
+        newid = newid + 1
+    return renames
+
+def check_ui_renames(renames, exists):
+    # Split planned renames into (renames, collisions): a rename is dropped when its target is
+    # already the target of an earlier rename, or an existing file (exists(path)) that isn't moved away.
+    # collisions: [(file, newfile, reason)]
+    key = os.path.normcase
+    sources = {key(file) for file, _ in renames}
+    targets = {}
+    moved = set()
+    kept = []
+    collisions = []
+    for file, newfile in renames:
+        if key(file) == key(newfile) or key(file) in moved:
+            continue
+        if key(newfile) in targets:
+            collisions.append((file, newfile, f"also the new name of {targets[key(newfile)]}"))
+        elif key(newfile) not in sources and exists(newfile):
+            collisions.append((file, newfile, "already exists"))
+        else:
+            targets[key(newfile)] = file
+            moved.add(key(file))
+            kept.append((file, newfile))
+    return kept, collisions
+
+def apply_ui_renames(renames):
+    # Rename in one batch, grouped by folder. When a target is also the source of another rename,
+    # everything is moved aside first so no file is overwritten midway.
+    # Returns [(file, newfile, error)] for the renames that failed.
+    failed = []
+    sources = {os.path.normcase(file) for file, _ in renames}
+    if any(os.path.normcase(newfile) in sources for _, newfile in renames):
+        staged = []
+        for file, newfile in renames:
+            aside = file + ".reslot-rename"
+            try:
+                os.rename(file, aside)
+                staged.append((aside, newfile))
+            except OSError as e:
+                failed.append((file, newfile, str(e)))
+        renames = staged
+    made = set()
+    for file, newfile in sorted(renames, key=lambda rename: os.path.dirname(rename[1])):
+        folder = os.path.dirname(newfile)
+        if folder not in made:
+            os.makedirs(folder, exist_ok=True)
+            made.add(folder)
+        try:
+            os.rename(file, newfile)
+        except OSError:
+            # if rename fails, attempt copy then remove
+            try:
+                shutil.copy(file, newfile)
+                os.remove(file)
+            except OSError as e:
+                failed.append((file, newfile, str(e)))
+    return failed
 
 def RenameUI(targetFolder, fighter_name, newname, startid=0):
     # CLI-friendly RenameUI: rename files in ui/replace and ui/replace_patch
+    # Returns {"renamed": [(file, newfile)], "collisions": [(file, newfile, reason)], "failed": [(file, newfile, error)]}
     print("New CSS name:", newname)
-    newid = int(startid or 0)
-    folders = [os.path.join(targetFolder, 'ui', 'replace'), os.path.join(targetFolder, 'ui', 'replace_patch')]
-    for folder in folders:
-        if not os.path.isdir(folder):
-            continue
-        for (dirpath, dirnames, filenames) in os.walk(folder):
-            for filename in filenames:
-                fighter_keys = [fighter_name]
-                if (fighter_name=="popo" or fighter_name=="nana"):
-                    fighter_keys = ["ice_climber"]
-                elif (fighter_name=="eflame"):
-                    fighter_keys = ["eflame_first","eflame_only"]
-                elif (fighter_name=="elight"):
-                    fighter_keys = ["elight_first","elight_only"]
-
-                for oldname in fighter_keys:
-                    file = os.path.join(dirpath, filename)
-                    newfilename = filename.replace("_"+oldname+"_", "_"+newname+"_")
-                    if newname+"_" not in newfilename:
-                        continue
-                    try:
-                        costumeslot = newfilename.index(newname+"_")
-                        newfilename = newfilename[:costumeslot] + newname + "_" + "{:02d}".format(newid) + ".bntx"
-                    except ValueError:
-                        # fallback: append newid
-                        base, ext = os.path.splitext(newfilename)
-                        newfilename = f"{base}_{newid:02d}{ext}"
-                    newfile = os.path.join(dirpath.replace("/ui/replace_patch","/ui/replace"), newfilename)
-                    try:
-                        os.makedirs(os.path.dirname(newfile), exist_ok=True)
-                    except:
-                        pass
-                    try:
-                        os.rename(file, newfile)
-                    except Exception:
-                        # if rename fails, attempt copy then remove
-                        try:
-                            shutil.copy(file, newfile)
-                            os.remove(file)
-                        except Exception:
-                            pass
-                newid = newid + 1
+    with event_stage("rename") as counts:
+        renames, collisions = check_ui_renames(plan_rename_ui(list(walk_ui_files(targetFolder)), fighter_name, newname, startid), os.path.exists)
+        failed = apply_ui_renames(renames)
+        counts.update(files=len(renames) - len(failed), collisions=len(collisions), failed=len(failed))
+    lost = {(file, newfile) for file, newfile, _ in failed}
+    report = {"renamed": [rename for rename in renames if rename not in lost], "collisions": collisions, "failed": failed}
+    for file, newfile, reason in collisions:
+        print(f"Skipped renaming {os.path.relpath(file, targetFolder)} to {os.path.basename(newfile)}: {reason}")
+    for file, newfile, error in failed:
+        print(f"Could not rename {os.path.relpath(file, targetFolder)} to {os.path.basename(newfile)}: {error}")
+    return report
+
+# --------------------------
+# Plan manifest (--plan-only)
+# --------------------------
+def config_delta(before, after):
+    # Entries of the resulting config that were not in the config.json loaded by core_init
+    delta = {}
+    for section, value in after.items():
+        old = before.get(section, {} if isinstance(value, dict) else [])
+        if isinstance(value, list):
+            added = [item for item in value if item not in old]
+        elif section == "new-dir-infos-base":
+            added = {key: base for key, base in value.items() if old.get(key) != base}
+        else:
+            added = {}
+            for key, files in value.items():
+                old_files = set(old.get(key, ()))
+                new_files = [f for f in files if f not in old_files]
+                if new_files or key not in old:
+                    added[key] = new_files
+        if added:
+            delta[section] = added
+    return delta
+
+def count_config_entries(cfg):
+    count = 0
+    for value in cfg.values():
+        if isinstance(value, list):
+            count += len(value)
+        elif isinstance(value, dict):
+            count += sum(len(v) if isinstance(v, list) else 1 for v in value.values())
+    return count
+
+def planned_ui_files(target_dir, paths):
+    # walk_ui_files() order for files that are only planned, not on disk yet
+    ui_files = []
+    for order, folder in enumerate([os.path.join(target_dir, 'ui', 'replace'), os.path.join(target_dir, 'ui', 'replace_patch')]):
+        for path in paths:
+            if path.startswith(folder + os.sep):
+                dirpath, filename = os.path.split(path)
+                ui_files.append(((order, tuple(os.path.relpath(dirpath, folder).split(os.sep)), filename), (dirpath, filename)))
+    return [entry for _, entry in sorted(ui_files)]
+
+def build_plan_manifest(mod_dir, target_dir, mode, mappings, copies, config, prcxml=None, redirect=None, archive=None, links=()):
+    rel = lambda root, path: fix_windows_path(os.path.relpath(path, root), True)
+    # archive entries are not extracted when only planning
+    size = archive.size if archive else os.path.getsize
+    latest = {}
+    for src, dst in copies:
+        latest.pop(dst, None)
+        latest[dst] = src
+    operations = []
+    for dst, src in latest.items():
+        operations.append({"op": "copy", "src": rel(mod_dir, src), "dst": rel(target_dir, dst), "bytes": size(src)})
+    for primary, dst in links:
+        operations.append({"op": "hardlink", "src": rel(target_dir, primary), "dst": rel(target_dir, dst)})
+    if mode in ("clone", "temp"):
+        for e in ["info.toml", "preview.webp"]:
+            src = os.path.join(mod_dir, e)
+            if os.path.isfile(src):
+                operations.append({"op": "copy", "src": e, "dst": e, "bytes": size(src)})
+    if mode == "temp":
+        operations.append({"op": "replace-folder", "src": target_dir, "dst": archive.output_base if archive else mod_dir})
+    if prcxml:
+        op = {"op": "write", "dst": "ui/param/database/ui_chara_db.prcxml", "colors": dict(prcxml)}
+        if len(prcxml) == 1:
+            op.update(fighter=prcxml[0][0], color_num=prcxml[0][1])
+        operations.append(op)
+    skipped_renames = []
+    if redirect:
+        planned = [os.path.join(target_dir, fix_windows_path(op["dst"], False)) for op in operations if op["op"] in ("copy", "hardlink")]
+        planned_set = set(planned)
+        renames, collisions = check_ui_renames(plan_rename_ui(planned_ui_files(target_dir, planned), redirect[0], redirect[1], redirect[2]),
+                                               planned_set.__contains__)
+        for file, newfile in renames:
+            operations.append({"op": "rename", "src": rel(target_dir, file), "dst": rel(target_dir, newfile)})
+        skipped_renames = [{"src": rel(target_dir, file), "dst": rel(target_dir, newfile), "reason": reason}
+                           for file, newfile, reason in collisions]
+    operations.append({"op": "write", "dst": "config.json"})
+
+    delta = config_delta(loaded_config, config)
+    manifest = {
+        "version": 1,
+        "mod_dir": archive.path if archive else mod_dir,
+        "target_dir": target_dir,
+        "mode": mode,
+        "mappings": mappings,
+        "operations": operations,
+        "config": config,
+        "config_delta": delta,
+        "totals": {
+            "files": sum(1 for op in operations if op["op"] == "copy"),
+            "bytes": sum(op.get("bytes", 0) for op in operations),
+            "renames": sum(1 for op in operations if op["op"] == "rename"),
+            "config_entries": count_config_entries(config),
+            "config_entries_added": count_config_entries(delta),
+        },
+    }
+    if skipped_renames:
+        manifest["skipped_renames"] = skipped_renames
+    return manifest
+
+# --------------------------
+# Archive output (--out-archive)
+# --------------------------
+def write_mod_archive(out_path, copies, target_dir, mod_dir, config, prcxml=None, redirect=None):
+    # What a --clone run would leave in target_dir, streamed straight into a zip (or an .fpp package).
+    # target_dir is only used to name the entries; nothing is written there.
+    latest = {}
+    for src, dst in copies:
+        latest.pop(dst, None)
+        latest[dst] = src
+    for e in ["info.toml", "preview.webp"]:
+        if os.path.isfile(os.path.join(mod_dir, e)):
+            latest[os.path.join(target_dir, e)] = os.path.join(mod_dir, e)
+
+    if redirect:
+        print("New CSS name:", redirect[1])
+        renames, collisions = check_ui_renames(plan_rename_ui(planned_ui_files(target_dir, list(latest)), *redirect), latest.__contains__)
+        for file, newfile, reason in collisions:
+            print(f"Skipped renaming {os.path.relpath(file, target_dir)} to {os.path.basename(newfile)}: {reason}")
+        # take every source out first, a new name can be the old name of another file
+        moved = [(newfile, latest.pop(file)) for file, newfile in renames if file in latest]
+        for newfile, src in moved:
+            latest.pop(newfile, None)
+            latest[newfile] = src
+
+    generated = []
+    prcxml_source = prcxml_sources() if prcxml else None
+    prcxml_colors = prcxml_target_colors(prcxml, prcxml_source[1]) if prcxml_source else None
+    if prcxml_colors:
+        generated.append(("ui/param/database/ui_chara_db.prcxml", lambda f: write_prcxml(prcxml_source[0], f, prcxml_colors)))
+    return write_archive(out_path, latest, target_dir, config, generated)
 
 def parse_map_args(maps_list):
     # Accept "c00=c02" or "c00:c02"
@@ -727,6 +1180,19 @@ def parse_map_args(maps_list):
         m[k.strip().replace("+","")] = v.strip().replace("+","")
     return m
 
+def parse_prcxml_args(prcxml_list):
+    # Accept "mario=12" or "mario:12"
+    pairs = []
+    for item in prcxml_list or []:
+        if "=" in item:
+            k,v = item.split("=",1)
+        elif ":" in item:
+            k,v = item.split(":",1)
+        else:
+            raise ValueError(f"Invalid prcxml '{item}', expected FIGHTER=COLORS")
+        pairs.append((k.strip().lower(), int(v)))
+    return pairs
+
 def parse_share_args(shares_list):
     s = {}
     for item in shares_list or []:
@@ -739,8 +1205,146 @@ def parse_share_args(shares_list):
         s[k.strip().replace("+","")] = v.strip().replace("+","")
     return s
 
+def reslot_fighter(args, fighter, mod_dir, hashes, target_dir, map_dict, share_dict, exclude_blanks):
+    # Run every mapping of one fighter against the bound ReslotContext; returns the mappings done
+    mappings = []
+
+    # Determine slots for this fighter if only-config or "all"
+    per_fighter_slots = []
+    # Collect slots from fighter folders
+    modelFolder = os.path.join(mod_dir,"fighter",fighter,"model")
+    motionFolder = os.path.join(mod_dir,"fighter",fighter,"motion")
+    if os.path.isdir(modelFolder):
+        per_fighter_slots += GetSlotsFromFolder(modelFolder)
+    if os.path.isdir(motionFolder):
+        per_fighter_slots += GetSlotsFromFolder(motionFolder)
+    per_fighter_slots = sorted(list(set(per_fighter_slots)))
+
+    # Build maps list for this fighter
+    pairs = []
+    if args.only_config and not map_dict:
+        # Identity maps on detected slots
+        for s in per_fighter_slots:
+            pairs.append((s, s))
+    else:
+        for k,v in map_dict.items():
+            pairs.append((k, v))
+
+    # Determine share slots for each source
+    def share_for(src, tgt):
+        key = src
+        if key in share_dict:
+            return share_dict[key]
+        # default share logic for added slots (c>=8) or if target is added
+        tgt_num = int(tgt.strip("c"))
+        src_num = int(src.strip("c"))
+        if tgt_num > 7:
+            assumed = GetAssumedShareSlot(src_num % 8, fighter)
+            return f"c0{assumed}"
+        return "c00"  # default vanilla share
+
+    # Plan every mapping of this fighter in one pass over the mod's files
+    plan_slot_copies(fighter, [(source, target if not args.only_config else source)
+                               for (source, target) in pairs if not (target == "" and exclude_blanks)])
+
+    for (source, target) in pairs:
+        if (target == "" and exclude_blanks):
+            continue
+        outdirCall = "" if args.only_config else target_dir
+        share = share_for(source, target if target else source)
+
+        if args.only_config:
+            print(f"[CONFIG] {fighter} {source}")
+        else:
+            print(f"[RESLOT] {fighter} {source} -> {target} (share {share})")
+        mappings.append({"fighter": fighter, "source": source, "target": target if not args.only_config else source, "share": share})
+
+        try:
+            core_run(mod_dir, hashes, fighter, source, target if not args.only_config else source, share, outdirCall)
+        except Exception as e:
+            print(f"Error: {fighter}/{source}: {e}")
+            sys.exit(1)
+    return mappings
+
+def _fighter_job(job):
+    # ProcessPoolExecutor entry point: one fighter with its own context, output captured
+    args, fighter, mod_dir, hashes, target_dir, map_dict, share_dict, exclude_blanks, fresh_config, files, events._count_membership = job
+    buffer = io.StringIO()
+    result = {"exitCode": 0, "mappings": [], "config": None, "copies": []}
+    COUNTERS.clear()
+    # the parent reports the stages; a forked worker must not write to its event stream
+    with contextlib.redirect_stdout(buffer), event_sink(None):
+        try:
+            context = core_init(hashes, mod_dir, fresh_config, files)
+            result["mappings"] = reslot_fighter(args, fighter, mod_dir, hashes, target_dir, map_dict, share_dict, exclude_blanks)
+            result.update(context.fragment())
+        except SystemExit as e:
+            result["exitCode"] = e.code if isinstance(e.code, int) and e.code else 1
+        except Exception as e:
+            print(f"Error: {fighter}: {e}")
+            result["exitCode"] = 1
+    result["output"] = buffer.getvalue()
+    result["counters"] = dict(COUNTERS)
+    return result
+
+def share_game_indexes(hashes_file):
+    # Build the memory-mapped sidecars before starting workers so every process maps the same
+    # files (shared through the page cache) instead of parsing the json and hash list itself.
+    load_dir_info(game_dir_info_file(hashes_file))
+    _cached_resource(hashes_file, _load_known_files)
+
 def reslot_cli(args):
-    mod_dir = os.path.abspath(args.mod_dir)
+    if args.events:
+        # stdout carries only the events; the usual messages go to stderr
+        with event_sink(ndjson_sink(sys.stdout)), contextlib.redirect_stdout(sys.stderr):
+            started = time.perf_counter()
+            exit_code = 1
+            try:
+                manifest = run_reslot(args)
+                exit_code = 0
+            except SystemExit as e:
+                exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                raise
+            finally:
+                emit_event("done", exitCode=exit_code, elapsed_ms=round((time.perf_counter() - started) * 1000, 1))
+            if manifest and args.plan_out:
+                with open(args.plan_out, "w", encoding="utf-8") as f:
+                    json.dump(manifest, f, ensure_ascii=False, indent=4)
+                print("Plan written to", args.plan_out)
+            elif manifest:
+                emit_event("plan", manifest=manifest)
+        return
+    if args.plan_only and not args.plan_out:
+        # stdout carries only the manifest
+        with contextlib.redirect_stdout(sys.stderr):
+            manifest = run_reslot(args)
+        if manifest:
+            print(json.dumps(manifest, ensure_ascii=False, indent=4))
+        return
+    manifest = run_reslot(args)
+    if manifest and args.plan_out:
+        with open(args.plan_out, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=4)
+        print("Plan written to", args.plan_out)
+
+def run_reslot(args):
+    reset_mod_indexes()
+    if is_mod_archive(args.mod_dir):
+        if args.in_place:
+            print("--in-place can't be used with an archive; the result is written next to it")
+            sys.exit(2)
+        import subprocess, zipfile
+        try:
+            archive = ModArchive(args.mod_dir, args.archive_root)
+        except (ValueError, OSError, zipfile.BadZipFile, subprocess.CalledProcessError) as e:
+            print(f"Invalid --mod-dir archive: {e}")
+            sys.exit(2)
+        with archive:
+            return reslot_mod(args, archive.stage(), archive)
+    return reslot_mod(args, os.path.abspath(args.mod_dir))
+
+def reslot_mod(args, mod_dir, archive=None):
+    # mod_dir: the mod folder, or the staging folder of an archive
     hashes = os.path.abspath(args.hashes)
     if not os.path.isdir(mod_dir):
         print("Invalid --mod-dir")
@@ -748,27 +1352,43 @@ def reslot_cli(args):
     if not os.path.isfile(hashes):
         print("Invalid --hashes")
         sys.exit(2)
-    if not IsValidSearch(mod_dir):
+    with event_stage("scan") as counts:
+        valid = IsValidSearch(mod_dir)
+        counts["files"] = len(archive.files) if archive else len(mod_index(mod_dir).sizes)
+    if not valid:
         print("The selected folder doesn't appear to be a valid mod. It must contain the 'fighter', 'sound', or 'ui' folders.")
         sys.exit(2)
 
+    if InPlaceTransaction.exists(mod_dir):
+        print("An interrupted in-place reslot was found in this mod. Run 'recover --mod-dir <mod>' to finish it, or add --rollback to undo it.")
+        sys.exit(2)
+
+    out_archive = os.path.abspath(args.out_archive) if args.out_archive else None
+    if out_archive and (args.only_config or args.in_place):
+        print("--out-archive can't be combined with --only-config or --in-place")
+        sys.exit(2)
+
     # Determine target directory behavior
-    clone = args.clone and not args.only_config
+    clone = (args.clone or bool(out_archive)) and not args.only_config
     exclude_blanks = args.exclude_blanks and not args.only_config
-    target_dir = mod_dir if args.only_config else (mod_dir + f" ({' '.join([v for v in (args.map or [])][:4]).replace('=',' ').strip()})" if clone else mod_dir+" (Temp)")
-    ensure_out_dir(target_dir)
+    in_place = args.in_place and not clone and not args.only_config
+    target_dir = mod_dir if (args.only_config or in_place) else (mod_dir + f" ({' '.join([v for v in (args.map or [])][:4]).replace('=',' ').strip()})" if clone else mod_dir+" (Temp)")
+    if archive:
+        # never written back into the archive: results go to a folder next to it
+        target_dir = target_dir.replace(mod_dir, archive.output_base, 1)
+        if not clone and os.path.exists(archive.output_base) and not args.plan_only:
+            print(f"'{archive.output_base}' already exists. Use --clone, or move it away first.")
+            sys.exit(2)
+    if not args.plan_only and not out_archive:
+        ensure_out_dir(target_dir)
 
     # Fighters set (handle special groups)
-    fighters = [args.fighter.lower()]
-    if fighters[0] in Climber:
-        fighters = Climber
-    if fighters[0] in Trainer:
-        fighters = Trainer
-    if fighters[0] in Aegis:
-        fighters = Aegis
+    fighters = list(FIGHTER_GROUPS.get(args.fighter.lower(), [args.fighter.lower()]))
 
     # Slot maps
-    fighters_all, slots_in_mod = SetFighters(mod_dir, fighters[0] if fighters[0] != "all" else "")
+    with event_stage("scan") as counts:
+        fighters_all, slots_in_mod = SetFighters(mod_dir, fighters[0] if fighters[0] != "all" else "")
+        counts["fighters"] = len([fighter for fighter in fighters_all if fighter != "all"])
     # Build identity map for only-config if not provided
     map_dict = parse_map_args(args.map) if args.map else {}
     share_dict = parse_share_args(args.share) if args.share else {}
@@ -786,132 +1406,408 @@ def reslot_cli(args):
     if os.path.isfile(os.path.join(mod_dir,"config.json")) and not args.only_config:
         # Ask user? In CLI assume append unless --new-config provided
         fresh_config = args.new_config
-    core_init(hashes, mod_dir, fresh_config)
+    files = archive.files if archive else None
+    core_init(hashes, mod_dir, fresh_config, files)
 
-    succeeded = False
+    mappings = []
 
     # Process "all" fighter or specific
     process_fighters = fighters_all if fighters[0] == "all" else fighters
 
-    for fighter in process_fighters:
-        if fighter == "all":
-            continue
-
-        # Determine slots for this fighter if only-config or "all"
-        per_fighter_slots = []
-        # Collect slots from fighter folders
-        modelFolder = os.path.join(mod_dir,"fighter",fighter,"model")
-        motionFolder = os.path.join(mod_dir,"fighter",fighter,"motion")
-        if os.path.isdir(modelFolder):
-            per_fighter_slots += GetSlotsFromFolder(modelFolder)
-        if os.path.isdir(motionFolder):
-            per_fighter_slots += GetSlotsFromFolder(motionFolder)
-        per_fighter_slots = sorted(list(set(per_fighter_slots)))
-
-        # Build maps list for this fighter
-        pairs = []
-        if args.only_config and not map_dict:
-            # Identity maps on detected slots
-            for s in per_fighter_slots:
-                pairs.append((s, s))
+    process_fighters = [fighter for fighter in process_fighters if fighter != "all"]
+    jobs = min(args.jobs or 1, len(process_fighters))
+    with event_stage("plan") as counts:
+        if jobs > 1:
+            # one fighter per worker process; the config fragments are merged in fighter order
+            share_game_indexes(hashes)
+            base_config = json.loads(json.dumps(resulting_config))
+            work = [(args, fighter, mod_dir, hashes, target_dir, map_dict, share_dict, exclude_blanks, fresh_config, files,
+                     events._count_membership) for fighter in process_fighters]
+            with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(_fighter_job, work))
+            for fighter, result in zip(process_fighters, results):
+                print(result["output"], end="")
+                if result["exitCode"]:
+                    sys.exit(result["exitCode"])
+                merge_config_fragment(resulting_config, base_config, result["config"], fighter)
+                for name, n in result["counters"].items():
+                    count(name, n)
+                pending_copies.extend(result["copies"])
+                mappings += result["mappings"]
         else:
-            for k,v in map_dict.items():
-                pairs.append((k, v))
-
-        # Determine share slots for each source
-        def share_for(src, tgt):
-            key = src
-            if key in share_dict:
-                return share_dict[key]
-            # default share logic for added slots (c>=8) or if target is added
-            tgt_num = int(tgt.strip("c"))
-            src_num = int(src.strip("c"))
-            if tgt_num > 7:
-                assumed = GetAssumedShareSlot(src_num % 8, fighter)
-                return f"c0{assumed}"
-            return "c00"  # default vanilla share
-
-        for (source, target) in pairs:
-            if (target == "" and exclude_blanks):
-                continue
-            outdirCall = "" if args.only_config else target_dir
-            share = share_for(source, target if target else source)
+            for fighter in process_fighters:
+                mappings += reslot_fighter(args, fighter, mod_dir, hashes, target_dir, map_dict, share_dict, exclude_blanks)
+        counts.update(fighters=len(process_fighters), mappings=len(mappings), files=len(pending_copies))
+    succeeded = bool(mappings)
 
-            if args.only_config:
-                print(f"[CONFIG] {fighter} {source}")
+    if succeeded:
+        # Write identical outputs once
+        links = []
+        if args.dedup != "off" and pending_copies and not in_place and not args.only_config:
+            if archive and args.plan_only:
+                print("Note: --dedup needs the file contents and is skipped when planning from an archive")
             else:
-                print(f"[RESLOT] {fighter} {source} -> {target} (share {share})")
-
-            try:
-                core_run(mod_dir, hashes, fighter, source, target if not args.only_config else source, share, outdirCall)
-                succeeded = True
-            except Exception as e:
-                print(f"Error: {fighter}/{source}: {e}")
-                sys.exit(1)
+                if archive:
+                    print(f"Extracted {archive.extract_sources(pending_copies, mod_dir)} files from {os.path.basename(archive.path)}")
+                links = dedupe_copies(pending_copies, args.dedup, target_dir, resulting_config, known_files,
+                                      args.io_threads, link=not out_archive)
 
-    if succeeded:
         # Order and cleanup config
         ordered = ordered_config_dict(resulting_config)
 
+        prcxml = parse_prcxml_args(args.prcxml)
+        if args.prcxml_colors and args.fighter != "all":
+            prcxml.insert(0, (args.fighter.lower(), int(args.prcxml_colors)))
+        redirect = None
+        if args.redirect_name and args.fighter != "all" and not args.only_config:
+            redirect = (args.fighter.lower(), args.redirect_name, int(args.redirect_start or 0))
+
+        if args.plan_only:
+            mode = "only-config" if args.only_config else ("clone" if clone else ("in-place" if in_place else "temp"))
+            manifest = build_plan_manifest(mod_dir, target_dir, mode, mappings, pending_copies,
+                                           ordered if ordered else resulting_config, prcxml, redirect, archive, links)
+            pending_copies.clear()
+            print("Planned.")
+            return manifest
+
+        if out_archive:
+            if archive and args.dedup == "off":
+                print(f"Extracted {archive.extract_sources(pending_copies, mod_dir)} files from {os.path.basename(archive.path)}")
+            with event_stage("copy") as counts:
+                stats = write_mod_archive(out_archive, pending_copies, target_dir, mod_dir,
+                                          ordered if ordered else resulting_config, prcxml, redirect)
+                counts.update(files=stats["files"], bytes=stats["bytes"])
+            count("files_copied", stats["files"])
+            count("bytes_copied", stats["bytes"])
+            pending_copies.clear()
+            print(f"Archived {stats['files']} files ({stats['bytes']} bytes): {stats['stored']} stored, {stats['deflated']} deflated")
+            print("Completed.")
+            print(out_archive)
+            return None
+
+        # Place every planned file in one batch
+        transaction = None
+        if in_place:
+            transaction = InPlaceTransaction(mod_dir)
+            stats = transaction.apply(pending_copies, ordered if ordered else resulting_config, args.link_mode)
+            count("files_copied", stats["files"] - stats["skipped"])
+            count("bytes_copied", stats["bytes"])
+            print(placement_summary(stats))
+            pending_copies.clear()
+        elif pending_copies:
+            cache = ReslotCache(target_dir, args.fingerprint) if args.incremental else None
+            mode = args.link_mode
+            if archive and args.dedup == "off":
+                print(f"Extracted {archive.extract_sources(pending_copies, mod_dir)} files from {os.path.basename(archive.path)}")
+                # the staged files are thrown away afterwards, so link them instead of copying again
+                mode = "hardlink" if mode == "copy" else mode
+            print(placement_summary(materialize(pending_copies, mode, args.io_threads, cache, links)))
+            pending_copies.clear()
+
         # Copy extras if cloning
-        if not args.only_config:
+        if not args.only_config and not in_place:
             for e in ["info.toml","preview.webp"]:
                 src = os.path.join(mod_dir, e)
                 if os.path.isfile(src):
                     shutil.copy(src, os.path.join(target_dir, e))
-            if not clone:
+            if archive and not clone:
+                os.rename(target_dir, archive.output_base)
+                target_dir = archive.output_base
+            elif not clone:
                 # Replace source with temp result
                 shutil.rmtree(mod_dir, ignore_errors=True)
                 os.rename(target_dir, mod_dir)
                 target_dir = mod_dir
 
         # PRCXML
-        if args.prcxml_colors and args.fighter != "all":
-            CreatePRCXML(args.fighter.lower(), target_dir, int(args.prcxml_colors))
+        if prcxml:
+            CreateMergedPRCXML(prcxml, target_dir)
 
         # CSS redirect rename
         if args.redirect_name and args.fighter != "all" and not args.only_config:
-            RenameUI(target_dir, args.fighter.lower(), args.redirect_name, int(args.redirect_start or 0))
+            report = RenameUI(target_dir, args.fighter.lower(), args.redirect_name, int(args.redirect_start or 0))
+            print(f"Renamed {len(report['renamed'])} ui files ({len(report['collisions'])} collisions, {len(report['failed'])} failed)")
 
         # Save config.json
-        newConfigLocation = os.path.join(target_dir, 'config.json')
-        with open(newConfigLocation, 'w+', encoding='utf-8') as f:
-            json.dump(ordered if ordered else resulting_config, f, ensure_ascii=False, indent=4)
+        with event_stage("config") as counts:
+            newConfigLocation = os.path.join(target_dir, 'config.json')
+            newConfig = json.dumps(ordered if ordered else resulting_config, ensure_ascii=False, indent=4)
+            unchanged = False
+            if args.incremental and os.path.isfile(newConfigLocation):
+                with open(newConfigLocation, 'r', encoding='utf-8') as f:
+                    unchanged = f.read() == newConfig
+            if not unchanged:
+                with open(newConfigLocation, 'w+', encoding='utf-8') as f:
+                    f.write(newConfig)
+            counts.update(entries=count_config_entries(ordered if ordered else resulting_config), bytes=len(newConfig.encode("utf-8")), unchanged=unchanged)
+        count("config_entries_added", counts["entries"] - count_config_entries(loaded_config))
+        if transaction:
+            transaction.commit()
 
         print("Completed.")
         print(target_dir)
     else:
         print("No operations performed.")
+    return None
 
-def scan_cli(args):
+def recover_cli(args):
     mod_dir = os.path.abspath(args.mod_dir)
+    if not InPlaceTransaction.exists(mod_dir):
+        print("No interrupted in-place reslot found in this mod.")
+        sys.exit(2)
+    transaction = InPlaceTransaction.load(mod_dir)
+    if args.rollback:
+        transaction.rollback()
+        print("Rolled back.")
+    else:
+        transaction.resume()
+        transaction.write_config()
+        transaction.commit()
+        print("Resumed. Re-run --prcxml-colors/--redirect-name steps if they were requested.")
+    print(mod_dir)
+
+def scan_mod_summary(mod_dir):
+    # fighters -> slots, file count and bytes of one mod folder (the scan --library record)
+    index = mod_index(mod_dir)
+    summary = {"mod": os.path.basename(mod_dir), "path": mod_dir, "enabled": not os.path.basename(mod_dir).startswith("."),
+               "valid": IsValidSearch(mod_dir), "fighters": {}, "files": len(index.sizes), "bytes": sum(index.sizes.values())}
+    if summary["valid"]:
+        fighters, _ = SetFighters(mod_dir)
+        for fighter in fighters:
+            if fighter != "all":
+                summary["fighters"][fighter] = sorted(set(SetFighters(mod_dir, fighter)[1]))
+    # None: scanned too close to a change to be cached
+    return summary, None if index.is_racy() else {rel: node[0] for rel, node in index.tree.items()}
+
+def scan_library(library, threads=None, use_cache=True):
+    # Yields one summary per mod folder of the library, in name order, scanning them on a thread pool.
+    # Summaries are kept in a cache file and reused while all of a mod's directory mtimes match.
+    library = os.path.abspath(library)
+    cache_file = os.path.join(cache_root(), "reslot-library-%s.json" % hashlib.blake2b(
+        library.encode("utf-8"), digest_size=8).hexdigest())
+    cached = {}
+    if use_cache:
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == MOD_INDEX_VERSION:
+                cached = data["mods"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def scan_one(mod_dir):
+        entry = cached.get(mod_dir)
+        if entry is not None:
+            try:
+                if all(os.stat(os.path.join(mod_dir, fix_windows_path(rel, False))).st_mtime_ns == mtime_ns
+                       for rel, mtime_ns in entry["dirs"].items()):
+                    return dict(entry["summary"], cached=True), entry
+            except OSError:
+                pass
+        try:
+            summary, dirs = scan_mod_summary(mod_dir)
+        except OSError as e:
+            return {"mod": os.path.basename(mod_dir), "path": mod_dir, "error": str(e)}, None
+        finally:
+            _mod_indexes.pop(mod_dir, None)
+        return dict(summary, cached=False), None if dirs is None else {"dirs": dirs, "summary": summary}
+
+    mod_dirs = library_mods(library)
+    fresh = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as pool:
+        for mod_dir, (summary, entry) in zip(mod_dirs, pool.map(scan_one, mod_dirs)):
+            if entry is not None:
+                fresh[mod_dir] = entry
+            yield summary
+    if use_cache:
+        try:
+            with open(cache_file + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"version": MOD_INDEX_VERSION, "library": library, "mods": fresh}, f, ensure_ascii=False)
+            os.replace(cache_file + ".tmp", cache_file)
+        except OSError:
+            pass
+
+def scan_library_cli(args):
+    if not os.path.isdir(args.library):
+        print("Invalid --library")
+        sys.exit(2)
+    mods = []
+    with event_stage("scan") as counts:
+        counts["mods"] = 0
+        for summary in scan_library(args.library, args.threads, not args.no_cache):
+            counts["mods"] += 1
+            if args.format == "ndjson":
+                print(json.dumps(summary, ensure_ascii=False), flush=True)
+            else:
+                mods.append(summary)
+    if args.format == "json":
+        totals = {"mods": len(mods), "files": sum(m.get("files", 0) for m in mods), "bytes": sum(m.get("bytes", 0) for m in mods),
+                  "cached": sum(1 for m in mods if m.get("cached"))}
+        print(json.dumps({"library": os.path.abspath(args.library), "mods": mods, "totals": totals}, ensure_ascii=False, indent=4))
+
+def conflicts_cli(args):
+    reset_mod_indexes()
+    if not os.path.isdir(args.library):
+        print("Invalid --library")
+        sys.exit(2)
+    report = find_library_conflicts(args.library, args.include_disabled, args.threads)
+    print(json.dumps(report, ensure_ascii=False, indent=4))
+
+def scan_cli(args):
+    # a library scan keeps its own per-mod cache (scan_library)
+    reset_mod_indexes(sidecar=not args.library)
+    if args.library:
+        return scan_library_cli(args)
+    if not args.mod_dir:
+        print("scan needs --mod-dir or --library")
+        sys.exit(2)
+    if is_mod_archive(args.mod_dir):
+        import subprocess, zipfile
+        try:
+            archive = ModArchive(args.mod_dir, args.archive_root)
+        except (ValueError, OSError, zipfile.BadZipFile, subprocess.CalledProcessError) as e:
+            print(f"Invalid --mod-dir archive: {e}")
+            sys.exit(2)
+        with archive:
+            return scan_mod(args, archive.stage())
+    return scan_mod(args, os.path.abspath(args.mod_dir))
+
+def scan_mod(args, mod_dir):
     if not os.path.isdir(mod_dir):
         print("Invalid --mod-dir")
         sys.exit(2)
-    if not IsValidSearch(mod_dir):
+    with event_stage("scan") as counts:
+        valid = IsValidSearch(mod_dir)
+        counts["files"] = len(mod_index(mod_dir).sizes)
+    if not valid:
         print("The selected folder doesn't appear to be a valid mod. It must contain the 'fighter', 'sound', or 'ui' folders.")
         sys.exit(2)
-    fighters, _ = SetFighters(mod_dir)
+    with event_stage("scan"):
+        fighters, _ = SetFighters(mod_dir)
+        slots = SetFighters(mod_dir, args.fighter.lower())[1] if args.fighter else []
     print("Fighters found:")
     for f in sorted(set(fighters)):
         print(f" - {f}")
     if args.fighter:
-        _, slots = SetFighters(mod_dir, args.fighter.lower())
         print(f"Slots for {args.fighter}:")
         for s in sorted(set(slots)):
             print(f" - {s}")
 
-def cli():
+# --------------------------
+# Serve mode (persistent worker, line-delimited JSON-RPC 2.0)
+# --------------------------
+def rpc_dispatch(method, params):
+    parser = build_parser()
+    if method == "ping":
+        return {"pong": True}
+    if method in ("reslot", "scan", "config", "conflicts"):
+        if isinstance(params, dict) and "argv" in params:
+            argv = list(params["argv"])
+        else:
+            argv = params_to_argv(params)
+        if method == "config":
+            method = "reslot"
+            argv.append("--only-config")
+        def run():
+            with contextlib.redirect_stderr(sys.stdout):
+                args = parser.parse_args([method] + argv)
+            if args.cache_dir:
+                set_cache_dir(args.cache_dir)
+            with cli_profile(args):
+                args.func(args)
+        return run_captured(run)
+    if method == "legacy":
+        argv = params["argv"] if isinstance(params, dict) else params
+        return run_captured(legacy_cli, list(argv))
+    raise LookupError(f"Method not found: {method}")
+
+def serve_cli(args):
+    serve(rpc_dispatch)
+
+def prcxml_cli(args):
+    try:
+        pairs = parse_prcxml_args(args.colors)
+    except ValueError as e:
+        print(e)
+        sys.exit(2)
+    CreateMergedPRCXML(pairs, os.path.abspath(args.out))
+
+def _batch_job(params):
+    params = dict(params)
+    return rpc_dispatch(params.pop("method", "reslot"), params)
+
+def batch_cli(args):
+    with open(args.jobs_file, "r", encoding="utf-8") as f:
+        jobs = json.load(f)
+    if not isinstance(jobs, list):
+        print("Invalid jobs file, expected a JSON list")
+        sys.exit(2)
+    mod_dirs = [os.path.abspath(job.get("mod_dir", "")) for job in jobs if isinstance(job, dict) and "argv" not in job]
+    if len(mod_dirs) != len(set(mod_dirs)):
+        print("Each mod may only appear once in a batch")
+        sys.exit(2)
+    if jobs and "hashes" in jobs[0]:
+        share_game_indexes(os.path.abspath(jobs[0]["hashes"]))
+    prcxml = []
+    if args.prcxml_out:
+        # one merged ui_chara_db.prcxml for the whole batch instead of one per job
+        jobs = [dict(job) for job in jobs]
+        for job in jobs:
+            colors = job.pop("prcxml_colors", None)
+            if colors and job.get("fighter", "all") != "all":
+                prcxml.append((job["fighter"].lower(), int(colors)))
+
+    failed = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as pool:
+        for i, result in enumerate(pool.map(_batch_job, jobs)):
+            print(f"[JOB {i + 1}/{len(jobs)}] exit {result['exitCode']}")
+            print(result["output"], end="")
+            if result["exitCode"]:
+                failed += 1
+    print(f"Batch finished: {len(jobs) - failed} succeeded, {failed} failed")
+    if prcxml:
+        CreateMergedPRCXML(prcxml, os.path.abspath(args.prcxml_out))
+    if failed:
+        sys.exit(1)
+
+def compile_index_cli(args):
+    src = os.path.abspath(args.dir_info)
+    if not os.path.isfile(src):
+        print("Invalid --dir-info")
+        sys.exit(2)
+    # by default into the cache folder, where runs look for it
+    out = os.path.abspath(args.out) if args.out else cache_path(src, ".bin")
+    nodes, files = compile_dir_info(src, out)
+    print(f"Compiled {nodes} directories and {files} files")
+    print(out)
+
+def build_parser():
     parser = argparse.ArgumentParser(description="Merged terminal-only reslotter (no GUI)")
     sub = parser.add_subparsers(dest="cmd", required=True)
 
     p_scan = sub.add_parser("scan", help="Scan fighters and slots")
-    p_scan.add_argument("--mod-dir", required=True, help="Path to mod directory")
+    p_scan.add_argument("--mod-dir", help="Path to mod directory, or a .zip/.fpp/.7z containing the mod")
+    p_scan.add_argument("--timings", action="store_true", help="Print startup and load times")
+    p_scan.add_argument("--library", help="Scan every mod folder in this directory (e.g. the mods folder)")
+    p_scan.add_argument("--format", choices=("ndjson", "json"), default="ndjson", help="With --library: one JSON line per mod as it is scanned, or one document")
+    p_scan.add_argument("--threads", type=int, help="With --library: scanning threads (default: Python's thread pool default)")
+    p_scan.add_argument("--no-cache", action="store_true", help="With --library: ignore and don't update the scan cache")
+    p_scan.add_argument("--archive-root", help="Folder of the mod inside the archive when it holds several")
     p_scan.add_argument("--fighter", required=False, help="Optional fighter to list slots for")
+    p_scan.add_argument("--profile", action="store_true", help=f"cProfile each stage; writes {PROFILE_SUMMARY_FILE} and reslot_profile.<stage>.prof to --profile-out (env {PROFILE_ENV}=1)")
+    p_scan.add_argument("--trace-memory", action="store_true", help=f"Record each stage's peak memory and top allocation sites in {PROFILE_SUMMARY_FILE} (env {TRACE_MEMORY_ENV}=1)")
+    p_scan.add_argument("--profile-out", help=f"Folder for the --profile / --trace-memory output (default: {PROFILE_DIR_NAME} in the cache dir or the temp folder; env {PROFILE_OUT_ENV})")
     p_scan.set_defaults(func=scan_cli)
 
+    p_conf = sub.add_parser("conflicts", help="Report files and fighter slots provided by more than one mod of a library")
+    p_conf.add_argument("--library", required=True, help="Mods folder to check")
+    p_conf.add_argument("--include-disabled", action="store_true", help="Also check disabled (dot-prefixed) mods")
+    p_conf.add_argument("--threads", type=int, help="Scanning threads (default: Python's thread pool default)")
+    p_conf.set_defaults(func=conflicts_cli)
+
     p_res = sub.add_parser("reslot", help="Reslot files and/or generate config.json")
-    p_res.add_argument("--mod-dir", required=True, help="Path to mod directory")
+    p_res.add_argument("--mod-dir", required=True, help="Path to mod directory, or a .zip/.fpp/.7z containing the mod")
+    p_res.add_argument("--archive-root", help="Folder of the mod inside the archive when it holds several (e.g. data/mods/my_mod)")
     p_res.add_argument("--hashes", required=True, help="Path to Hashes_all.txt")
     p_res.add_argument("--fighter", required=True, help="Fighter name or 'all'")
     p_res.add_argument("--map", action="append", help="Mapping cXX=cYY, repeatable")
@@ -923,40 +1819,101 @@ def cli():
     p_res.add_argument("--redirect-name", help="CSS redirect new fighter id (e.g., knuckles)")
     p_res.add_argument("--redirect-start", type=int, default=0, help="CSS redirect start color index")
     p_res.add_argument("--prcxml-colors", type=int, help="Write ui_chara_db.prcxml with this max color_num")
+    p_res.add_argument("--prcxml", action="append", help="Also set another fighter's max color_num in the same ui_chara_db.prcxml, FIGHTER=COLORS, repeatable")
+    p_res.add_argument("--out-archive", help="Write the reslotted mod straight into this .zip (or .fpp package) instead of a folder")
+    p_res.add_argument("--plan-only", action="store_true", help="Do not touch the filesystem; emit a JSON manifest of the planned operations")
+    p_res.add_argument("--plan-out", help="With --plan-only, write the manifest to this file instead of stdout")
+    p_res.add_argument("--incremental", action="store_true", help="Only re-place files whose source changed since the last run into this output folder")
+    p_res.add_argument("--fingerprint", choices=FINGERPRINTS, default="stat", help="With --incremental, also compare content digests when size/mtime changed")
+    p_res.add_argument("--dedup", choices=DEDUP_MODES, default="off", help="Write identical outputs once: hardlink the copies, or (share) express added files as config.json shares of an identical vanilla path the run doesn't write; groups without one are hardlinked")
+    p_res.add_argument("--in-place", action="store_true", help="Without --clone, reslot inside the mod folder (journaled) instead of via a temp copy")
+    p_res.add_argument("--link-mode", choices=LINK_MODES, default="copy", help="How reslotted files are placed (falls back to copy)")
+    p_res.add_argument("--io-threads", type=int, help="Threads used to place files (default: Python's thread pool default)")
+    p_res.add_argument("--timings", action="store_true", help="Print how long startup and each game resource load took (and which were never needed)")
+    p_res.add_argument("--events", choices=EVENT_FORMATS, help="Stream machine-readable stage/progress events on stdout (other messages go to stderr)")
+    p_res.add_argument("--jobs", type=int, default=1, help="With several fighters (--fighter all, climbers...), reslot them in this many processes")
+    p_res.add_argument("--profile", action="store_true", help=f"cProfile each stage; writes {PROFILE_SUMMARY_FILE} and reslot_profile.<stage>.prof to --profile-out (env {PROFILE_ENV}=1)")
+    p_res.add_argument("--trace-memory", action="store_true", help=f"Record each stage's peak memory and top allocation sites in {PROFILE_SUMMARY_FILE} (env {TRACE_MEMORY_ENV}=1)")
+    p_res.add_argument("--profile-out", help=f"Folder for the --profile / --trace-memory output (default: {PROFILE_DIR_NAME} in the cache dir or the temp folder; env {PROFILE_OUT_ENV})")
     p_res.set_defaults(func=reslot_cli)
 
-    args = parser.parse_args()
-    args.func(args)
+    p_recover = sub.add_parser("recover", help="Resume (or roll back) an interrupted --in-place reslot")
+    p_recover.add_argument("--mod-dir", required=True, help="Path to mod directory")
+    p_recover.add_argument("--rollback", action="store_true", help="Undo the interrupted reslot instead of finishing it")
+    p_recover.set_defaults(func=recover_cli)
+
+    p_index = sub.add_parser("compile-index", help="Compile dir_info_with_files_trimmed.json into a memory-mapped index")
+    p_index.add_argument("--dir-info", default=DIR_INFO_FILE, help="Path to dir_info_with_files_trimmed.json")
+    p_index.add_argument("--out", help="Output path (default: the cache folder, where runs look for it)")
+    p_index.set_defaults(func=compile_index_cli)
+
+    p_batch = sub.add_parser("batch", help="Run many reslot jobs (one per mod) in parallel processes")
+    p_batch.add_argument("jobs_file", help="JSON list of reslot params, as sent to serve (e.g. {\"mod_dir\": ..., \"map\": [...]})")
+    p_batch.add_argument("--jobs", type=int, help="Worker processes (default: CPU count)")
+    p_batch.add_argument("--prcxml-out", help="Write one merged ui_chara_db.prcxml for the jobs' prcxml_colors under this folder instead of one per job")
+    p_batch.set_defaults(func=batch_cli)
+
+    p_prcxml = sub.add_parser("prcxml", help="Write a ui_chara_db.prcxml setting the max color_num of one or more fighters")
+    p_prcxml.add_argument("--out", required=True, help="Folder to write ui/param/database/ui_chara_db.prcxml into (e.g. a mod folder)")
+    p_prcxml.add_argument("--colors", action="append", required=True, help="FIGHTER=COLORS, repeatable")
+    p_prcxml.set_defaults(func=prcxml_cli)
+
+    p_serve = sub.add_parser("serve", help="Serve reslot/scan/config requests as JSON-RPC over stdin/stdout")
+    p_serve.set_defaults(func=serve_cli)
+
+    for p in (p_scan, p_conf, p_res, p_batch, p_prcxml, p_serve, p_index):
+        p.add_argument("--cache-dir", help="Folder for the compiled game indexes and scan caches, shared between runs (default: next to the resources / temp folder; env RESLOT_CACHE_DIR)")
+    return parser
+
+def cli():
+    args = build_parser().parse_args()
+    if getattr(args, "cache_dir", None):
+        set_cache_dir(args.cache_dir)
+    with cli_profile(args):
+        if getattr(args, "timings", False):
+            try:
+                args.func(args)
+            finally:
+                report_timings()
+            return
+        args.func(args)
+
+def legacy_cli(argv):
+    # Legacy positional mode: <mod_directory> <hashes_file> <fighter_name> <current_alt> <target_alt> <share_slot> <out_directory>
+    if len(argv) != 7:
+        usage()
+    mod_directory, hashes_file, fighter_name, current_alt, target_alt, share_slot, out_directory = argv
+
+    if not os.path.isdir(mod_directory) or not os.path.isfile(hashes_file):
+        usage()
+    # no flags in this mode: RESLOT_PROFILE / RESLOT_TRACE_MEMORY turn on the profiling, RESLOT_PROFILE_OUT places it
+    with profile_run(env_flag(PROFILE_ENV), env_flag(TRACE_MEMORY_ENV), None):
+        reset_mod_indexes()
+        with event_stage("scan"):
+            valid = IsValidSearch(mod_directory)
+        if not valid:
+            print("The selected folder doesn't appear to be a valid mod. It must contain the 'fighter', 'sound', or 'ui' folders.")
+            sys.exit(2)
+
+        # Initialize (append to existing config by default)
+        init(hashes_file, mod_directory, newConfig=False)
+        # Execute and write config.json
+        main(mod_directory, hashes_file, fighter_name, current_alt, target_alt, share_slot, out_directory)
+    print("Completed.")
+    print(out_directory if out_directory != "" else mod_directory)
+
+TIMINGS["import"] = (time.perf_counter() - _IMPORT_STARTED) * 1000
 
 if __name__ == "__main__":
     # Support legacy usage (same as reslotternoGUI.py), or advanced subcommands
     try:
-        # Legacy positional mode: script + 7 args
-        if len(sys.argv) == 8:
-            mod_directory = sys.argv[1]
-            hashes_file = sys.argv[2]
-            fighter_name = sys.argv[3]
-            current_alt = sys.argv[4]
-            target_alt = sys.argv[5]
-            share_slot = sys.argv[6]
-            out_directory = sys.argv[7]
-
-            if not os.path.isdir(mod_directory) or not os.path.isfile(hashes_file):
-                usage()
-            if not IsValidSearch(mod_directory):
-                print("The selected folder doesn't appear to be a valid mod. It must contain the 'fighter', 'sound', or 'ui' folders.")
-                sys.exit(2)
-
-            # Initialize (append to existing config by default)
-            init(hashes_file, mod_directory, newConfig=False)
-            # Execute and write config.json
-            main(mod_directory, hashes_file, fighter_name, current_alt, target_alt, share_slot, out_directory)
-            print("Completed.")
-            print(out_directory if out_directory != "" else mod_directory)
-
-        # Advanced argparse mode if subcommand provided
-        elif len(sys.argv) > 1 and sys.argv[1] in ("scan", "reslot"):
+        # Advanced argparse mode if subcommand provided (checked first: a subcommand can also take 7 args)
+        if len(sys.argv) > 1 and sys.argv[1] in ("scan", "reslot", "recover", "serve", "compile-index", "batch", "conflicts", "prcxml"):
             cli()
+
+        # Legacy positional mode: script + 7 args
+        elif len(sys.argv) == 8:
+            legacy_cli(sys.argv[1:])
         else:
             usage()
     except Exception as e:
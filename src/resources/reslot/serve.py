@@ -0,0 +1,84 @@
+# Serve mode transport: line-delimited JSON-RPC 2.0 on stdin/stdout, requests handled by a dispatch
+# function with their output captured.
+import os
+import sys
+import io
+import json
+import contextlib
+import threading
+
+from events import event_sink
+
+# --------------------------
+# Serve mode (persistent worker, line-delimited JSON-RPC 2.0)
+# --------------------------
+def params_to_argv(params):
+    # {"mod_dir": "x", "map": ["c00=c08"], "clone": true} -> ["--mod-dir", "x", "--map", "c00=c08", "--clone"]
+    argv = []
+    for key, value in (params or {}).items():
+        flag = "--" + key.replace("_", "-")
+        if value is None or value is False:
+            continue
+        if value is True:
+            argv.append(flag)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                argv += [flag, str(item)]
+        else:
+            argv += [flag, str(value)]
+    return argv
+
+def run_captured(func, *args):
+    # Run a CLI entry point with its prints captured; sys.exit() becomes an exit code
+    buffer = io.StringIO()
+    exit_code = 0
+    with contextlib.redirect_stdout(buffer):
+        try:
+            func(*args)
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            if not isinstance(e.code, (int, type(None))):
+                print(e.code)
+        except Exception as e:
+            print(f"Error: {e}")
+            exit_code = 1
+    return {"exitCode": exit_code, "output": buffer.getvalue()}
+
+def serve(dispatch):
+    # Answer requests from stdin with dispatch(method, params) until shutdown or end of input. Responses
+    # go to the real stdout; dispatch captures what is printed while handling a request (see run_captured).
+    out = sys.stdout
+    lock = threading.Lock()  # progress events can come from the copy threads
+    def respond(message):
+        line = json.dumps(message, ensure_ascii=False) + "\n"
+        with lock:
+            out.write(line)
+            out.flush()
+
+    respond({"jsonrpc": "2.0", "method": "ready", "params": {"pid": os.getpid()}})
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            respond({"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": f"Parse error: {e}"}})
+            continue
+        req_id = request.get("id")
+        method = request.get("method")
+        if method == "shutdown":
+            respond({"jsonrpc": "2.0", "id": req_id, "result": {"exitCode": 0}})
+            break
+        params = request.get("params") or {}
+        # "events": true streams the stage events of this request as notifications before its result
+        events = isinstance(params, dict) and bool(params.pop("events", False))
+        sink = (lambda event, req_id=req_id: respond({"jsonrpc": "2.0", "method": "event", "params": {"id": req_id, **event}})) if events else None
+        try:
+            with event_sink(sink):
+                result = dispatch(method, params)
+            respond({"jsonrpc": "2.0", "id": req_id, "result": result})
+        except LookupError as e:
+            respond({"jsonrpc": "2.0", "id": req_id, "error": {"code": -32601, "message": str(e)}})
+        except Exception as e:
+            respond({"jsonrpc": "2.0", "id": req_id, "error": {"code": -32603, "message": str(e)}})
@@ -0,0 +1,54 @@
+# Shared fixtures: the reslotter modules are imported from src/resources/reslot and the game index
+# and mods are the synthetic ones of benchmarks/synth.py.
+import os
+import sys
+import shutil
+import subprocess
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESLOT_DIR = os.path.join(REPO_DIR, "src", "resources", "reslot")
+sys.path.insert(0, RESLOT_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+
+import synth
+
+@pytest.fixture(scope="session")
+def game_dir(tmp_path_factory):
+    # program directory of a run: game index and ui_chara_db files, as in the app's resources
+    game = str(tmp_path_factory.mktemp("game"))
+    synth.write_game_index(game)
+    for name in ("ui_chara_db.prcxml", "ui_chara_db.txt"):
+        shutil.copy(os.path.join(RESLOT_DIR, name), game)
+    return game
+
+@pytest.fixture
+def write_mod(tmp_path):
+    # write_mod(name, fighters, slots, files) -> path of a synthetic mod folder
+    def write(name="mod", fighters=("mario", "popo", "nana"), slots=2, files=2):
+        mod_dir = str(tmp_path / name)
+        synth.write_mod(mod_dir, fighters, slots, files)
+        return mod_dir
+    return write
+
+@pytest.fixture
+def run_reslotter(game_dir, tmp_path):
+    # run reslotter.py as the app does (a script, program directory as cwd) with its own cache folder
+    def run(*argv):
+        env = dict(os.environ, RESLOT_CACHE_DIR=str(tmp_path / "cache"))
+        result = subprocess.run([sys.executable, os.path.join(RESLOT_DIR, "reslotter.py"), *argv], cwd=game_dir, env=env,
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, timeout=300)
+        assert result.returncode == 0, result.stdout
+        return result.stdout
+    return run
+
+def tree(root):
+    # relative path -> content of every file below root
+    files = {}
+    for dir_name, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(dir_name, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, root).replace(os.sep, "/")] = f.read()
+    return files
@@ -0,0 +1,83 @@
+import os
+import json
+import zipfile
+
+import pytest
+
+from reslotter import write_mod_archive
+from archive import STORED_EXTENSIONS
+from conftest import tree
+
+CONFIG = {"new-dir-infos": ["fighter/mario/c08"], "new-dir-files": {}, "share-to-vanilla": {}, "share-to-added": {}}
+
+@pytest.fixture
+def copies(write_mod, tmp_path):
+    mod_dir = write_mod(fighters=("mario",), slots=1, files=2)
+    target_dir = str(tmp_path / "out")
+    copies = []
+    for rel in sorted(tree(mod_dir)):
+        if "c00" in rel or rel.endswith("_00.bntx"):
+            copies.append((os.path.join(mod_dir, rel), os.path.join(target_dir, rel.replace("c00", "c08").replace("_00.bntx", "_08.bntx"))))
+    return mod_dir, target_dir, copies
+
+def entries(path):
+    with zipfile.ZipFile(path) as zf:
+        return {info.filename: info for info in zf.infolist()}
+
+@pytest.mark.parametrize("name, prefix", (("out.zip", ""), ("my_mod.fpp", "data/mods/my_mod/")))
+def test_entry_names(copies, tmp_path, name, prefix):
+    mod_dir, target_dir, planned = copies
+    out = str(tmp_path / name)
+    stats = write_mod_archive(out, planned, target_dir, mod_dir, CONFIG)
+    found = entries(out)
+    expected = {prefix + os.path.relpath(dst, target_dir).replace(os.sep, "/") for _, dst in planned}
+    expected |= {prefix + "info.toml", prefix + "preview.webp", prefix + "config.json"}
+    if prefix:
+        # createFPP.js layout: a manifest at the root, the mod below data/mods/<name>/
+        expected.add("manifest.json")
+        with zipfile.ZipFile(out) as zf:
+            assert json.loads(zf.read("manifest.json"))["directories"] == ["mods/my_mod"]
+    assert set(found) == expected
+    assert stats["files"] == len(planned) + 2
+    assert not os.path.exists(target_dir)
+    assert not os.path.exists(out + ".tmp")
+    with zipfile.ZipFile(out) as zf:
+        assert json.loads(zf.read(prefix + "config.json")) == CONFIG
+
+def test_stored_and_deflated_entries(copies, tmp_path):
+    mod_dir, target_dir, planned = copies
+    out = str(tmp_path / "out.zip")
+    stats = write_mod_archive(out, planned, target_dir, mod_dir, CONFIG)
+    found = entries(out)
+    stored = [name for name, info in found.items() if info.compress_type == zipfile.ZIP_STORED]
+    deflated = [name for name, info in found.items() if info.compress_type == zipfile.ZIP_DEFLATED]
+    # already compressed formats (sound banks, webp) are stored, everything else is deflated
+    assert stored and all(os.path.splitext(name)[1] in STORED_EXTENSIONS for name in stored)
+    assert any(name.endswith(".nutexb") for name in deflated)
+    assert not any(os.path.splitext(name)[1] in STORED_EXTENSIONS for name in deflated)
+    assert (stats["stored"], stats["deflated"]) == (len(stored), len(deflated) - 1)  # config.json is not counted
+
+def test_later_copies_win(copies, tmp_path):
+    mod_dir, target_dir, planned = copies
+    dst = planned[0][1]
+    other = planned[1][0]
+    out = str(tmp_path / "out.zip")
+    write_mod_archive(out, planned + [(other, dst)], target_dir, mod_dir, CONFIG)
+    with zipfile.ZipFile(out) as zf:
+        with open(other, "rb") as f:
+            assert zf.read(os.path.relpath(dst, target_dir).replace(os.sep, "/")) == f.read()
+
+def test_out_archive_matches_clone(game_dir, write_mod, run_reslotter, tmp_path):
+    # the archive holds exactly what --clone leaves in its folder, prcxml and CSS renames included
+    mod_dir = write_mod(fighters=("mario",), slots=2)
+    args = ("reslot", "--mod-dir", mod_dir, "--hashes", os.path.join(game_dir, "Hashes_all.txt"), "--fighter", "mario",
+            "--map", "c00=c08", "--map", "c01=c09", "--prcxml-colors", "10", "--redirect-name", "knuckles")
+    run_reslotter(*args, "--clone")
+    out = str(tmp_path / "out.zip")
+    run_reslotter(*args, "--out-archive", out)
+    with zipfile.ZipFile(out) as zf:
+        archived = {name: zf.read(name) for name in zf.namelist()}
+    cloned = tree(mod_dir + " (c00 c08 c01 c09)")
+    assert "ui/param/database/ui_chara_db.prcxml" in archived
+    assert any("knuckles" in name for name in archived)
+    assert archived == cloned
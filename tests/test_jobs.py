@@ -0,0 +1,45 @@
+import os
+import json
+import shutil
+
+import pytest
+
+import reslotter
+from helpers import UniqueList
+from conftest import tree
+
+MAPS = ("--map", "c00=c08", "--map", "c01=c09", "--share", "c00=c00", "--share", "c01=c01")
+
+@pytest.mark.parametrize("mode", ("--clone", "--only-config"))
+def test_jobs_match_a_sequential_run(game_dir, write_mod, run_reslotter, mode):
+    # each fighter of --fighter all in its own worker process, config fragments merged in fighter order
+    results = []
+    for jobs in ("1", "3"):
+        mod_dir = write_mod(f"mod{jobs}")
+        # the synthetic game index has no kirby folder for the copy ability files, so --fighter all can't reslot them
+        shutil.rmtree(os.path.join(mod_dir, "fighter", "kirby"))
+        run_reslotter("reslot", "--mod-dir", mod_dir, "--hashes", os.path.join(game_dir, "Hashes_all.txt"),
+                      "--fighter", "all", *MAPS, mode, "--jobs", jobs)
+        results.append(tree(mod_dir + " (c00 c08 c01 c09)" if mode == "--clone" else mod_dir))
+    sequential, parallel = results
+    assert parallel.keys() == sequential.keys()
+    assert parallel["config.json"] == sequential["config.json"]
+    assert parallel == sequential
+    assert any(json.loads(sequential["config.json"]).values())
+
+def test_merge_config_fragment_replays_the_fighters_in_order():
+    # a key a fighter dropped from the base goes away, list items are added once, transplant effects stay last
+    base = {"new-dir-infos": UniqueList(["fighter/mario/c08"]), "new-dir-infos-base": {},
+            "new-dir-files": {"fighter/mario/c08": UniqueList(["a"]), "fighter/mario/cmn": UniqueList(["t"])},
+            "share-to-vanilla": {"old": UniqueList(["x"])}, "share-to-added": {}}
+    merged = reslotter.unique_config(json.loads(json.dumps(base)))
+    fragment = {"new-dir-infos": ["fighter/mario/c08", "fighter/mario/c09"],
+                "new-dir-files": {"fighter/mario/cmn": ["t"], "fighter/mario/c08": ["a", "b"], "fighter/mario/c09": ["c"]},
+                "new-dir-infos-base": {"fighter/mario/c09": "fighter/mario/c01"}, "share-to-vanilla": {}, "share-to-added": {"s": ["y"]}}
+    reslotter.merge_config_fragment(merged, base, fragment, "mario")
+    assert merged["new-dir-infos"] == ["fighter/mario/c08", "fighter/mario/c09"]
+    assert list(merged["new-dir-files"]) == ["fighter/mario/c08", "fighter/mario/c09", "fighter/mario/cmn"]
+    assert merged["new-dir-files"]["fighter/mario/c08"] == ["a", "b"]
+    assert merged["new-dir-infos-base"] == {"fighter/mario/c09": "fighter/mario/c01"}
+    assert merged["share-to-vanilla"] == {}
+    assert merged["share-to-added"] == {"s": ["y"]}
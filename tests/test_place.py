@@ -0,0 +1,106 @@
+import os
+import shutil
+
+import pytest
+
+import place
+from place import InPlaceTransaction
+from conftest import tree
+
+STEPS = ("staging", "pruning", "placing")
+CONFIG = {"new-dir-infos": ["fighter/mario/c08"], "new-dir-files": {}, "share-to-vanilla": {}, "share-to-added": {}}
+
+def plan(mod_dir):
+    # c00 -> c08, and c01 moved onto c00 and copied to c09: a source that is also a destination,
+    # and a source with several destinations
+    copies = []
+    for rel in sorted(tree(mod_dir)):
+        for current, targets in (("/c00/", ("/c08/",)), ("/c01/", ("/c00/", "/c09/"))):
+            if rel.startswith("fighter/mario/") and current in rel:
+                copies += [(os.path.join(mod_dir, rel), os.path.join(mod_dir, rel.replace(current, target))) for target in targets]
+    return copies
+
+def interrupt(monkeypatch, step, copies):
+    # fail like a crash in the middle of the given step of InPlaceTransaction.resume()
+    if step == "placing":
+        target, name, allowed = place, "place_file", 1
+    else:
+        # staging renames each source once, pruning then renames the mod's top-level entries
+        sources = len({src for src, _ in copies})
+        target, name, allowed = os, "rename", 2 if step == "staging" else sources + 1
+    real = getattr(target, name)
+    calls = []
+    def failing(*args):
+        calls.append(args)
+        if len(calls) > allowed:
+            raise RuntimeError("interrupted")
+        return real(*args)
+    monkeypatch.setattr(target, name, failing)
+
+def finished(mod_dir):
+    # files of a completed reslot of a pristine copy of mod_dir
+    transaction = InPlaceTransaction(mod_dir)
+    transaction.apply(plan(mod_dir), CONFIG)
+    transaction.write_config()
+    transaction.commit()
+    return tree(mod_dir)
+
+@pytest.fixture
+def mod_dir(write_mod):
+    return write_mod(fighters=("mario", "popo"), slots=2, files=2)
+
+def test_apply_places_the_plan(mod_dir):
+    before = tree(mod_dir)
+    after = finished(mod_dir)
+    assert after["fighter/mario/model/body/c08/model.numdlb"] == before["fighter/mario/model/body/c00/model.numdlb"]
+    assert after["fighter/mario/model/body/c00/model.numdlb"] == before["fighter/mario/model/body/c01/model.numdlb"]
+    assert after["fighter/mario/model/body/c09/model.numdlb"] == before["fighter/mario/model/body/c01/model.numdlb"]
+    # unplanned content is dropped, the metadata files are kept
+    assert not any(rel.startswith("fighter/popo/") or rel.startswith("ui/") for rel in after)
+    assert after["info.toml"] == before["info.toml"] and after["preview.webp"] == before["preview.webp"]
+    assert sorted(os.listdir(mod_dir)) == ["config.json", "fighter", "info.toml", "preview.webp"]
+
+@pytest.mark.parametrize("step", STEPS)
+def test_rollback_restores_the_mod(mod_dir, monkeypatch, step):
+    before = tree(mod_dir)
+    with monkeypatch.context() as patch:
+        copies = plan(mod_dir)
+        interrupt(patch, step, copies)
+        with pytest.raises(RuntimeError):
+            InPlaceTransaction(mod_dir).apply(copies, CONFIG)
+    assert InPlaceTransaction.exists(mod_dir)
+    transaction = InPlaceTransaction.load(mod_dir)
+    assert transaction.state == step
+    transaction.rollback()
+    assert tree(mod_dir) == before
+    assert not InPlaceTransaction.exists(mod_dir)
+
+@pytest.mark.parametrize("step", STEPS)
+def test_resume_finishes_the_reslot(mod_dir, tmp_path, monkeypatch, step):
+    expected = finished(shutil.copytree(mod_dir, str(tmp_path / "expected")))
+    with monkeypatch.context() as patch:
+        copies = plan(mod_dir)
+        interrupt(patch, step, copies)
+        with pytest.raises(RuntimeError):
+            InPlaceTransaction(mod_dir).apply(copies, CONFIG)
+    transaction = InPlaceTransaction.load(mod_dir)
+    transaction.resume()
+    transaction.write_config()
+    transaction.commit()
+    assert tree(mod_dir) == expected
+
+def test_recover_command_resumes(mod_dir, tmp_path, monkeypatch, run_reslotter):
+    expected = finished(shutil.copytree(mod_dir, str(tmp_path / "expected")))
+    with monkeypatch.context() as patch:
+        copies = plan(mod_dir)
+        interrupt(patch, "placing", copies)
+        with pytest.raises(RuntimeError):
+            InPlaceTransaction(mod_dir).apply(copies, CONFIG)
+    run_reslotter("recover", "--mod-dir", mod_dir)
+    assert tree(mod_dir) == expected
+
+def test_rollback_refuses_placed_files(mod_dir):
+    transaction = InPlaceTransaction(mod_dir)
+    transaction.apply(plan(mod_dir), CONFIG)
+    with pytest.raises(ValueError):
+        InPlaceTransaction.load(mod_dir).rollback()